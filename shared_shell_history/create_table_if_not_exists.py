@@ -1,8 +1,27 @@
 import argparse
+import fcntl
+import os
+import subprocess
+import sys
+import zlib
+from datetime import datetime
 
-from sqlalchemy import create_engine
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import DatabaseError, IntegrityError
+from sqlalchemy.orm import Session
 
-from shared_shell_history_model import Base
+from frecency import compute_frecencies, is_frecency_filled, replace_frecency
+from shared_shell_history_database import create_database_engine, run_with_retry
+from shared_shell_history_model import Base, HistoryMetadata, ShellCommand
+
+# Only one process per host fills the frecency table at a time
+FRECENCY_FILL_LOCK = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "frecency_fill.lock"
+)
+
+# Recorded in the metadata table once compressed commands have been restored
+RESTORED_KEY = "compressed_commands_restored"
 
 
 def main():
@@ -13,13 +32,173 @@ def main():
         required=True,
         help="Database URL"
     )
+    parser.add_argument(
+        "--fill-frecency",
+        action="store_true",
+        help="Fill the frecency table from the recorded history instead"
+    )
     args = parser.parse_args()
 
     database_url = args.database
 
-    engine = create_engine(database_url)
+    engine = create_database_engine(database_url)
+    if args.fill_frecency:
+        fill_frecency_table(engine)
+        return
+
+    try:
+        create_schema(engine)
+    except DatabaseError:
+        # Another shell created the same table, index or column at the same
+        # time, the second attempt skips it as it exists now
+        create_schema(engine)
+
+    # Fill the frecency table from the already recorded history until a fill
+    # has completed, e.g. after an upgrade or an interrupted fill
+    with Session(engine) as session:
+        frecency_filled = is_frecency_filled(session)
+    if not frecency_filled:
+        start_frecency_fill(database_url)
+
+
+def create_schema(engine):
+    """Creates the tables, indexes and columns that do not exist yet.
+
+    Args:
+        engine (Engine): SQLAlchemy engine object.
+    """
     Base.metadata.create_all(engine, checkfirst=True)
 
+    # create_all skips existing tables, so indexes added later have to be
+    # created separately for databases created by an older version
+    for index in ShellCommand.__table__.indexes:
+        index.create(engine, checkfirst=True)
+
+    add_missing_columns(engine)
+    run_with_retry(restore_compressed_commands, engine)
+
+
+def start_frecency_fill(database_url):
+    """Starts filling the frecency table in a background process.
+
+    Reading the whole history can take a while, the shell does not wait for it.
+    Until the fill has completed, the frecent order only reflects new commands.
+
+    Args:
+        database_url (str): Database URL.
+    """
+    subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__),
+         "--database", database_url, "--fill-frecency"],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True
+    )
+
+
+def fill_frecency_table(engine):
+    """Fills the frecency table from the already recorded history.
+
+    The history is read in its own transaction, the table is then replaced in
+    a short write transaction. Nothing is done if another process on this host
+    is filling the table or a fill has completed in the meantime.
+
+    Args:
+        engine (Engine): SQLAlchemy engine object.
+    """
+    with open(FRECENCY_FILL_LOCK, "w") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return
+
+        with Session(engine) as session:
+            if is_frecency_filled(session):
+                return
+            frecencies, max_id = compute_frecencies(session)
+
+        try:
+            run_with_retry(replace_frecency_table, engine, frecencies, max_id)
+        except IntegrityError:
+            # Another host filled the table at the same time
+            pass
+
+
+def replace_frecency_table(engine, frecencies, max_id):
+    """Replaces the frecency table with computed rows in one transaction.
+
+    Args:
+        engine (Engine): SQLAlchemy engine object.
+        frecencies (dict): The rows returned by compute_frecencies.
+        max_id (int): The largest command ID the rows were computed from.
+    """
+    with Session(engine) as session:
+        replace_frecency(session, frecencies, max_id)
+        session.commit()
+
+
+def add_missing_columns(engine):
+    """Adds columns added by newer versions to an existing bash_commands table.
+
+    Args:
+        engine (Engine): SQLAlchemy engine object.
+    """
+    table = ShellCommand.__table__
+    existing_columns = {
+        column["name"] for column in inspect(engine).get_columns(table.name)
+    }
+    with engine.begin() as connection:
+        for column in table.columns:
+            if column.name not in existing_columns:
+                column_type = column.type.compile(dialect=engine.dialect)
+                connection.execute(text(
+                    f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+                ))
+
+
+def restore_compressed_commands(engine):
+    """Restores the full text of commands stored compressed by an earlier version.
+
+    The earlier version kept only a preview of long commands in the command
+    column and their full text zlib compressed in command_compressed, which
+    older versions sharing the database do not read. The full text is written
+    back to the command column once, the compressed column is left in place.
+
+    Args:
+        engine (Engine): SQLAlchemy engine object.
+    """
+    table = ShellCommand.__tablename__
+    existing_columns = {column["name"] for column in inspect(engine).get_columns(table)}
+    if "command_compressed" not in existing_columns:
+        return
+
+    with Session(engine) as session:
+        if session.get(HistoryMetadata, RESTORED_KEY) is not None:
+            return
+
+        compressed_commands = session.execute(text(
+            f"SELECT id, command_compressed FROM {table} WHERE command_compressed IS NOT NULL"
+        )).all()
+        if compressed_commands:
+            session.execute(
+                text(
+                    f"UPDATE {table} SET command = :command, command_compressed = NULL "
+                    "WHERE id = :id"
+                ),
+                [
+                    {
+                        "id": command.id,
+                        "command": zlib.decompress(command.command_compressed).decode(
+                            errors="surrogatepass"
+                        ),
+                    }
+                    for command in compressed_commands
+                ]
+            )
+        session.add(HistoryMetadata(key=RESTORED_KEY, value=datetime.now().isoformat()))
+        session.commit()
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,236 @@
+import hashlib
+import math
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, desc, insert, select
+from sqlalchemy.exc import IntegrityError
+
+from shared_shell_history_model import CommandFrecency, HistoryMetadata, ShellCommand
+
+# The weight of a use halves with every half-life that passes
+HALF_LIFE = timedelta(days=7)
+
+# Fixed reference time of the stored scores
+EPOCH = datetime(2024, 1, 1)
+
+# Key of the metadata row written once the frecency table has been filled
+FILLED_KEY = "frecency_filled"
+
+
+def command_hash(command):
+    """Returns the hash identifying a command text in the frecency table.
+
+    Args:
+        command (str): Command.
+
+    Returns:
+        str: Hex digest of the command text.
+    """
+    return hashlib.sha1(command.encode(errors="surrogatepass")).hexdigest()
+
+
+def time_weight(time):
+    """Returns the base 2 logarithm of the weight of a use at the given time.
+
+    The weight doubles with every half-life after the epoch. Adding up these
+    weights is equivalent to decaying all earlier uses, but the stored scores
+    never have to be updated when time passes.
+
+    Args:
+        time (datetime): Time of the use, as stored by the database.
+
+    Returns:
+        float: Logarithm of the weight.
+    """
+    return (time - EPOCH) / HALF_LIFE
+
+
+def add_logarithms(a, b):
+    """Returns log2(2**a + 2**b) without overflowing."""
+    larger, smaller = max(a, b), min(a, b)
+    return larger + math.log2(1 + 2 ** (smaller - larger))
+
+
+def subtract_logarithms(a, b):
+    """Returns log2(2**a - 2**b), or None if the difference is not positive."""
+    if b >= a:
+        return None
+    return a + math.log2(1 - 2 ** (b - a))
+
+
+def add_command(session, command):
+    """Adds a use of a command to the frecency of its user and command text.
+
+    The command has to be flushed already, so its ID and time are set. Commands
+    are identified by their full text. The frecency row is locked until the end
+    of the transaction, so concurrent uses of the same command are not lost.
+
+    Args:
+        session (Session): SQLAlchemy session the command was added in.
+        command (ShellCommand): The inserted command.
+    """
+    key = (command.user_name, command_hash(command.command))
+    weight = time_weight(command.time)
+
+    frecency = session.get(CommandFrecency, key, with_for_update=True)
+    if frecency is None:
+        try:
+            with session.begin_nested():
+                session.add(CommandFrecency(
+                    user_name=command.user_name,
+                    command_hash=key[1],
+                    command=command.command,
+                    count=1,
+                    score=weight,
+                    last_id=command.id
+                ))
+            return
+        except IntegrityError:
+            # Added concurrently by another shell
+            frecency = session.get(
+                CommandFrecency, key, populate_existing=True, with_for_update=True
+            )
+
+    frecency.count += 1
+    frecency.score = add_logarithms(frecency.score, weight)
+    frecency.last_id = max(frecency.last_id, command.id)
+
+
+def remove_command(session, command):
+    """Removes a use of a command from the frecency of its user and command text.
+
+    Has to be called before the command is deleted from bash_commands. The
+    frecency row is locked until the end of the transaction like in add_command.
+
+    Args:
+        session (Session): SQLAlchemy session the command is deleted in.
+        command (ShellCommand): The command to be deleted.
+    """
+    # The command may be detached, its full text is loaded in this session
+    command = session.get(ShellCommand, command.id)
+    if command is None:
+        return
+
+    key = (command.user_name, command_hash(command.command))
+    frecency = session.get(CommandFrecency, key, with_for_update=True)
+    if frecency is None:
+        return
+
+    frecency.count -= 1
+    score = subtract_logarithms(frecency.score, time_weight(command.time))
+    if frecency.count <= 0 or score is None:
+        session.delete(frecency)
+        return
+    frecency.score = score
+
+    if frecency.last_id == command.id:
+        frecency.last_id = session.execute(
+            select(ShellCommand.id).where(
+                ShellCommand.user_name == command.user_name,
+                ShellCommand.command == command.command,
+                ShellCommand.id != command.id
+            ).order_by(desc(ShellCommand.id)).limit(1)
+        ).scalar()
+        if frecency.last_id is None:
+            session.delete(frecency)
+
+
+def is_frecency_filled(session):
+    """Checks if the frecency table has been filled from the recorded history.
+
+    Args:
+        session (Session): SQLAlchemy session.
+
+    Returns:
+        bool: True if a fill has completed, False otherwise.
+    """
+    return session.get(HistoryMetadata, FILLED_KEY) is not None
+
+
+def compute_frecencies(session):
+    """Computes the frecency of all commands in bash_commands.
+
+    Only the needed columns are read, not ShellCommand objects.
+
+    Args:
+        session (Session): SQLAlchemy session.
+
+    Returns:
+        tuple: The frecency rows as dicts, keyed by user name and command hash,
+            and the largest command ID read.
+    """
+    frecencies = {}
+    max_id = 0
+    query = select(
+        ShellCommand.id,
+        ShellCommand.user_name,
+        ShellCommand.command,
+        ShellCommand.time
+    ).order_by(ShellCommand.id).execution_options(yield_per=10000)
+    for command in session.execute(query):
+        key = (command.user_name, command_hash(command.command))
+        weight = time_weight(command.time)
+
+        frecency = frecencies.get(key)
+        if frecency is None:
+            frecencies[key] = {
+                "user_name": command.user_name,
+                "command_hash": key[1],
+                "command": command.command,
+                "count": 1,
+                "score": weight,
+                "last_id": command.id,
+            }
+        else:
+            frecency["count"] += 1
+            frecency["score"] = add_logarithms(frecency["score"], weight)
+            frecency["last_id"] = command.id
+        max_id = command.id
+
+    return frecencies, max_id
+
+
+def replace_frecency(session, frecencies, max_id):
+    """Replaces the frecency table with computed rows and marks it as filled.
+
+    Commands added after the rows were computed are added on top, so the rows
+    can be computed in a separate read transaction and the table is only
+    locked for writing while it is replaced. The marker is written in the same
+    transaction, so an interrupted fill is started again, see is_frecency_filled.
+
+    Args:
+        session (Session): SQLAlchemy session.
+        frecencies (dict): The rows returned by compute_frecencies.
+        max_id (int): The largest command ID the rows were computed from.
+    """
+    session.execute(delete(CommandFrecency))
+    session.execute(delete(HistoryMetadata).where(HistoryMetadata.key == FILLED_KEY))
+    if frecencies:
+        session.execute(insert(CommandFrecency), list(frecencies.values()))
+
+    new_commands = select(ShellCommand).where(ShellCommand.id > max_id).order_by(ShellCommand.id)
+    for command in session.scalars(new_commands).all():
+        add_command(session, command)
+
+    session.add(HistoryMetadata(key=FILLED_KEY, value=datetime.now().isoformat()))
+
+
+def fetch_frecent_commands(session, usernames, limit):
+    """Returns the most recent use of the most frecent commands of the given users.
+
+    Args:
+        session (Session): SQLAlchemy session.
+        usernames (list): User names.
+        limit (int): Maximum number of commands.
+
+    Returns:
+        list: ShellCommand objects, most frecent first.
+    """
+    query = select(ShellCommand).join(
+        CommandFrecency, CommandFrecency.last_id == ShellCommand.id
+    ).where(
+        CommandFrecency.user_name.in_(usernames)
+    ).order_by(
+        desc(CommandFrecency.score)
+    ).limit(limit)
+    return list(session.scalars(query))
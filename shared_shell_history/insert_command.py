@@ -1,16 +1,28 @@
 import argparse
+import os
+import sys
+from datetime import datetime
 
-from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import Session
 
+from frecency import add_command
+from shared_shell_history_database import create_database_engine, run_with_retry
 from shared_shell_history_model import ShellCommand
 
+# Commands that could not be saved are logged here, one line per command
+DROPPED_COMMANDS_LOG = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "dropped_commands.log"
+)
+
 
 def main():
     """Entry point of the script.
 
     Parses command line arguments and inserts a command record into the
-    database.
+    database. If the database stays locked, the command is dropped, reported
+    and counted in the dropped commands log.
     """
     parser = argparse.ArgumentParser()
     parser.add_argument("--command", type=str, required=True)
@@ -24,20 +36,47 @@ def main():
     if arguments.venv == "":
         arguments.venv = None
 
-    engine = create_engine(arguments.database)
+    engine = create_database_engine(arguments.database)
+
+    try:
+        run_with_retry(
+            insert_command,
+            engine,
+            arguments.user,
+            arguments.host,
+            arguments.path,
+            arguments.command,
+            arguments.venv
+        )
+    except OperationalError as error:
+        dropped = log_dropped_command(error)
+        print(
+            f"shared_shell_history: Command not saved, {dropped} dropped in total "
+            f"(see {DROPPED_COMMANDS_LOG}): {error.orig}",
+            file=sys.stderr
+        )
+        sys.exit(1)
+
 
-    insert_command(
-        engine,
-        arguments.user,
-        arguments.host,
-        arguments.path,
-        arguments.command,
-        arguments.venv
-    )
+def log_dropped_command(error):
+    """Logs a command that could not be saved to the dropped commands log.
+
+    Only the time and the error are logged, not the command itself.
+
+    Args:
+        error (OperationalError): The error that caused the command to be dropped.
+
+    Returns:
+        int: The total number of dropped commands in the log.
+    """
+    with open(DROPPED_COMMANDS_LOG, "a+") as log:
+        log.write(f"{datetime.now().isoformat()} {error.orig}\n")
+        log.seek(0)
+        return sum(1 for _ in log)
 
 
 def insert_command(engine, user, host, path, command, venv):
-    """Inserts a command into the database.
+    """Inserts a command into the database and updates its frecency.
 
     Args:
         engine (Engine): SQLAlchemy engine object.
@@ -56,6 +95,8 @@ def insert_command(engine, user, host, path, command, venv):
             venv=venv
         )
         session.add(new_command)
+        session.flush()
+        add_command(session, new_command)
         session.commit()
 
 
@@ -0,0 +1,277 @@
+from sqlalchemy import desc, distinct, func, select
+from sqlalchemy.orm import Session
+
+from shared_shell_history_database import create_database_engine
+from shared_shell_history_model import ShellCommand
+
+
+class CommandCache:
+    """
+    An in-memory cache of the command history.
+
+    The cache holds all commands ordered by their IDs in descending order,
+    together with the distinct usernames and hosts. After the initial load
+    it is refreshed incrementally by only fetching commands with an ID larger
+    than the largest ID already cached.
+
+    For a fast startup the cache can be created with only the newest page of
+    commands, the full history is then fetched with `fetch_history`, e.g. in
+    a background thread, and swapped in with `set_history`.
+
+    Attributes:
+        database (str): The database connection string or path.
+        commands (list): The cached ShellCommand objects, newest first.
+        usernames (list): The distinct usernames of the cached commands.
+        hosts (list): The distinct hosts of the cached commands.
+        removed_ids (list): The IDs of commands removed from the cache.
+    """
+    # Number of commands fetched per query when loading the full history
+    PAGE_SIZE = 10_000
+
+    def __init__(self, database, first_page_size=None, usernames=None):
+        """
+        Initializes the CommandCache and loads the command history.
+
+        Args:
+            database (str): The database connection string or path.
+            first_page_size (int, optional): If given, only this many of the newest
+                commands are loaded instead of the full history.
+            usernames (list, optional): Users the first page is limited to.
+        """
+        self.database = database
+        self.engine = create_database_engine(database)
+        self.removed_ids = []
+
+        if first_page_size is None:
+            self.set_history(*self.fetch_history())
+        else:
+            commands = self.fetch_commands(usernames=usernames, limit=first_page_size)
+            self.set_history(
+                commands,
+                list(dict.fromkeys(command.user_name for command in commands)),
+                list(dict.fromkeys(command.host for command in commands))
+            )
+
+    @property
+    def max_id(self):
+        """
+        The largest command ID in the cache, or 0 if the cache is empty.
+        """
+        return self.commands[0].id if self.commands else 0
+
+    def fetch_distinct_column_values(self, column):
+        """
+        Fetch and return a list of distinct values from a specified column in the database.
+
+        Args:
+            column (Column): The SQLAlchemy Column object to fetch distinct values from.
+
+        Returns:
+            list: A list of distinct values from the specified column.
+        """
+        with Session(self.engine) as session:
+            query = select(distinct(column))
+            results = session.execute(query).all()
+        return [result[0] for result in results]
+
+    def fetch_commands(
+        self,
+        min_id=0,
+        time_from=None,
+        time_to=None,
+        before_id=None,
+        usernames=None,
+        limit=None
+    ):
+        """
+        Fetch and return all command entries with an ID larger than `min_id`
+        and optionally within a time range, ordered by their IDs in descending order.
+
+        The time range is evaluated by the database using the index on `time`.
+
+        Args:
+            min_id (int): Only commands with a larger ID are fetched. Defaults to 0.
+            time_from (datetime, optional): Only commands run at or after this time are fetched.
+            time_to (datetime, optional): Only commands run before this time are fetched.
+            before_id (int, optional): Only commands with a smaller ID are fetched.
+            usernames (list, optional): Only commands of these users are fetched.
+            limit (int, optional): The maximum number of commands fetched.
+
+        Returns:
+            list: A list of ShellCommand objects representing the command entries.
+        """
+        query = select(ShellCommand).where(ShellCommand.id > min_id)
+        if before_id is not None:
+            query = query.where(ShellCommand.id < before_id)
+        if usernames is not None:
+            query = query.where(ShellCommand.user_name.in_(usernames))
+        if time_from is not None:
+            query = query.where(ShellCommand.time >= time_from)
+        if time_to is not None:
+            query = query.where(ShellCommand.time < time_to)
+
+        query = query.order_by(desc(ShellCommand.id))
+        if limit is not None:
+            query = query.limit(limit)
+
+        with Session(self.engine) as session:
+            results = session.execute(query).all()
+
+        return [result[0] for result in results]
+
+    def fetch_history(self, progress=None):
+        """
+        Fetch the full command history in pages, newest first.
+
+        The pages are fetched by ID ranges using the primary key, so every page
+        is a cheap query. The cache itself is not changed, see `set_history`.
+
+        Args:
+            progress (Callable, optional): Called after every page with the number
+                of fetched commands and the total number of commands.
+
+        Returns:
+            tuple: The list of ShellCommand objects, newest first, and the lists
+                of distinct usernames and hosts.
+        """
+        with Session(self.engine) as session:
+            total = session.execute(
+                select(func.count()).select_from(ShellCommand)
+            ).scalar()
+
+        commands = []
+        before_id = None
+        while True:
+            page = self.fetch_commands(before_id=before_id, limit=self.PAGE_SIZE)
+            commands.extend(page)
+            if progress is not None:
+                progress(len(commands), total)
+            if len(page) < self.PAGE_SIZE:
+                break
+            before_id = page[-1].id
+
+        usernames = self.fetch_distinct_column_values(ShellCommand.user_name)
+        hosts = self.fetch_distinct_column_values(ShellCommand.host)
+        return commands, usernames, hosts
+
+    def set_history(self, commands, usernames, hosts):
+        """
+        Replace the cached history.
+
+        Commands removed from the cache before are removed from the new history
+        as well, since it may have been fetched before they were deleted.
+
+        Args:
+            commands (list): The ShellCommand objects, newest first.
+            usernames (list): The distinct usernames.
+            hosts (list): The distinct hosts.
+        """
+        self.commands = commands
+        self.usernames = usernames
+        self.hosts = hosts
+        self.discard_ids(self.removed_ids)
+
+    def fetch_full_command(self, command):
+        """
+        Return the full text of a command.
+
+        The cached commands only hold a preview of long commands, their full
+        text is fetched on demand.
+
+        Args:
+            command (ShellCommand): The command object.
+
+        Returns:
+            str: The full text of the command.
+        """
+        if not command.is_truncated:
+            return command.preview
+
+        with Session(self.engine) as session:
+            command_text = session.execute(
+                select(ShellCommand.command).where(ShellCommand.id == command.id)
+            ).scalar()
+
+        if command_text is None:
+            # The command was deleted in the meantime
+            return command.preview
+        return command_text
+
+    def fetch_current_time(self):
+        """
+        Fetch the current time of the database.
+
+        The stored command times are set by the database, so relative time
+        ranges have to be based on its clock and time zone, not the local one.
+
+        Returns:
+            datetime: The current time of the database.
+        """
+        with Session(self.engine) as session:
+            return session.execute(select(func.current_timestamp())).scalar()
+
+    def refresh(self):
+        """
+        Fetch commands added since the last load and prepend them to the cache.
+
+        Returns:
+            list: The newly fetched ShellCommand objects, newest first.
+        """
+        return self.add_commands(self.fetch_commands(self.max_id))
+
+    def add_commands(self, new_commands):
+        """
+        Prepend newly fetched commands to the cache.
+
+        Commands that are already cached are skipped, so results of overlapping
+        fetches can be added safely.
+
+        Args:
+            new_commands (list): ShellCommand objects fetched with an ID larger
+                than `max_id`, newest first.
+
+        Returns:
+            list: The ShellCommand objects that were added, newest first.
+        """
+        max_id = self.max_id
+        new_commands = [command for command in new_commands if command.id > max_id]
+        if not new_commands:
+            return new_commands
+
+        self.commands[:0] = new_commands
+        for command in new_commands:
+            if command.user_name not in self.usernames:
+                self.usernames.append(command.user_name)
+            if command.host not in self.hosts:
+                self.hosts.append(command.host)
+
+        return new_commands
+
+    def remove(self, command):
+        """
+        Remove a command from the cache and remember its ID.
+
+        The command is matched by its ID, so it may also be an object that was
+        fetched separately, e.g. for a time range.
+
+        Args:
+            command (ShellCommand): The command object to be removed.
+        """
+        for index, cached_command in enumerate(self.commands):
+            if cached_command.id == command.id:
+                del self.commands[index]
+                break
+        self.removed_ids.append(command.id)
+
+    def discard_ids(self, ids):
+        """
+        Remove all commands with the given IDs from the cache.
+
+        Args:
+            ids (Iterable[int]): The IDs of the commands to be removed.
+        """
+        ids = set(ids)
+        if ids:
+            self.commands = [
+                command for command in self.commands if command.id not in ids
+            ]
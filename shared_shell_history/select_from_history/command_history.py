@@ -1,18 +1,27 @@
 import re
+import threading
 
+from textual import work
 from textual.app import App, ComposeResult
 from textual.binding import Binding
 from textual.widgets import Footer, Label, ListView
+from textual.worker import get_current_worker
 
-from sqlalchemy import create_engine, delete, desc, distinct, select
+from sqlalchemy import delete
 from sqlalchemy.orm import Session
 
+from .command_cache import CommandCache
 from .command_list_item import CommandListItem
 from .info_screen import InfoScreen
+from .jump_to_date_screen import JumpToDateScreen
 from .lazy_loading_list_view import LazyLoadingListView
+from .parallel_search import ParallelSearch
 from .search_screen import SearchScreen
 from .selection_screen import SelectionScreen
+from .time_range_screen import TimeRangeScreen, database_timezone, format_local_time
 
+from frecency import fetch_frecent_commands, remove_command
+from shared_shell_history_database import run_with_retry
 from shared_shell_history_model import ShellCommand
 
 
@@ -25,9 +34,20 @@ class CommandHistory(App):
         Binding("i", "show_info()", "Show Info", show=True),
         Binding("d", "delete_entry()", "Delete Entry", show=True),
         Binding("s", "search", "Search", show=True),
+        Binding("t", "select_time_range()", "Time Range", show=True),
+        Binding("j", "jump_to_date()", "Jump to Date", show=True),
+        Binding("f", "toggle_frecency_order()", "Frecent/Recent", show=True),
     ]
+    # Seconds between two checks for commands added in other shells
+    LIVE_TAIL_INTERVAL = 2.0
+    # Minimum number of commands for which searches run on all CPU cores
+    PARALLEL_SEARCH_THRESHOLD = 200_000
+    # Number of commands shown when ordering by frecency
+    FRECENT_COMMANDS_LIMIT = 1000
+    # Number of the newest commands shown before the full history is loaded
+    FIRST_PAGE_SIZE = 200
 
-    def __init__(self, database, tmp_file, user=None, host=None):
+    def __init__(self, database, tmp_file, user=None, host=None, command_cache=None):
         """
         Initialize the CommandHistory instance.
 
@@ -36,78 +56,173 @@ class CommandHistory(App):
             tmp_file (str): The path to the temporary file for command storage.
             user (str, optional): User to initially filter the commands by.
             host (str, optional): Host to initially filter the commands by.
+            command_cache (CommandCache, optional): An already loaded cache of the
+                command history, e.g. provided by the picker server. If omitted,
+                only the newest page of commands is loaded, the full history is
+                loaded in the background after the app is mounted.
         """
         super().__init__()
         self.database = database
         self.tmp_file = tmp_file
         self.search_string = ""
+        self.time_from = None
+        self.time_to = None
+        # Time zone of the database clock, set when a time range is selected
+        self.database_tz = None
+        self.order_by_frecency = False
+        self.parallel_search = None
+        self.parallel_search_lock = threading.Lock()
+        # Identifies the latest filtering, results of older searches are discarded
+        self.search_id = 0
+        self.searching = False
+
+        # (loaded, total) number of commands while the history is loading
+        self.loading_progress = None
+        if command_cache is None:
+            command_cache = CommandCache(
+                database,
+                first_page_size=self.FIRST_PAGE_SIZE,
+                usernames=None if user is None else [user]
+            )
+            self.loading_progress = (len(command_cache.commands), None)
+        self.command_cache = command_cache
 
-        self.commands = self.fetch_commands()
-        self.usernames = self.fetch_users()
-        self.hosts = self.fetch_hosts()
+        self.commands = command_cache.commands
+        self.usernames = list(command_cache.usernames)
+        self.hosts = list(command_cache.hosts)
 
         self.selected_usernames = self.usernames if user is None else [user]
         self.selected_hosts = self.hosts if host is None else [host]
 
         self.filtered_commands = self.get_filtered_commands()
 
-    def fetch_users(self):
+    def get_filtered_commands(self):
         """
-        Fetch and return a list of distinct usernames from the database.
+        Filter the command list based on selected usernames, hosts, and a search string.
+
+        Large histories are searched on all CPU cores in a worker. An empty list
+        is returned for them, the matching commands are added to the list view
+        as they are found, see `search_in_parallel`.
 
         Returns:
-            list: A list of unique usernames.
+            list: A list of filtered ShellCommand objects.
         """
-        return self.fetch_distinct_column_values(ShellCommand.user_name)
+        self.search_id += 1
+        self.searching = False
+
+        if self.search_string and len(self.commands) >= self.PARALLEL_SEARCH_THRESHOLD:
+            # The full history can only be searched once it is loaded
+            source = self.command_cache.commands if self.loading_progress is None else self.commands
+            self.searching = True
+            self.search_in_parallel(
+                self.search_id,
+                source,
+                list(self.commands),
+                self.search_string,
+                set(self.selected_usernames),
+                set(self.selected_hosts)
+            )
+            return []
 
-    def fetch_hosts(self):
-        """
-        Fetch and return a list of distinct hostnames from the database.
+        return [command for command in self.commands if self.command_matches_filters(command)]
 
-        Returns:
-            list: A list of unique hostnames.
+    # The default description is built from the repr of all arguments, which is
+    # slow for the command lists
+    @work(thread=True, group="parallel_search", description="Parallel search")
+    def search_in_parallel(self, search_id, source, commands, search_string, usernames, hosts):
         """
-        return self.fetch_distinct_column_values(ShellCommand.host)
+        Search the commands for the search string on all CPU cores in a thread.
 
-    def fetch_distinct_column_values(self, column):
-        """
-        Fetch and return a list of distinct values from a specified column in the database.
+        The search runs on a snapshot of `source`, usually the cached history, so
+        the snapshot is reused for time ranges and only taken again when the
+        history is replaced. Commands added since the snapshot was taken are
+        searched directly, commands of the snapshot that are not in `commands`
+        are skipped. The matching commands of every shard are added to the list
+        view as soon as the shard is searched, in the order of the commands.
+
+        Args:
+            search_id (int): The ID of this search, see `add_search_results`.
+            source (list): The ShellCommand objects the snapshot is taken of.
+            commands (list): The ShellCommand objects to be filtered.
+            search_string (str): The regular expression to search for.
+            usernames (set): The selected usernames.
+            hosts (set): The selected hosts.
+        """
+        worker = get_current_worker()
+        parallel_search = self.get_parallel_search(source)
+
+        def matches_facets(command):
+            return command.user_name in usernames and command.host in hosts
+
+        snapshot_max_id = parallel_search.max_id
+        search = re.compile(search_string).search
+        new_commands = [
+            command for command in commands
+            if command.id > snapshot_max_id and matches_facets(command) and search(command.preview)
+        ]
+        self.call_from_thread(self.add_search_results, search_id, new_commands)
+
+        commands_by_id = {command.id: command for command in commands}
+        for shard_commands in parallel_search.search_shards(search_string):
+            if worker.is_cancelled or search_id != self.search_id:
+                return
+            matching_commands = [
+                commands_by_id[command.id] for command in shard_commands
+                if command.id in commands_by_id and matches_facets(command)
+            ]
+            self.call_from_thread(self.add_search_results, search_id, matching_commands)
+
+        self.call_from_thread(self.finish_search, search_id)
+
+    def get_parallel_search(self, source):
+        """
+        Return the parallel search over a snapshot of the given commands.
+
+        The snapshot is only taken again if `source` is a different list. The
+        previous snapshot is released once no search uses it anymore.
 
         Args:
-            column (Column): The SQLAlchemy Column object to fetch distinct values from.
+            source (list): The ShellCommand objects the snapshot is taken of.
 
         Returns:
-            list: A list of distinct values from the specified column.
+            ParallelSearch: The parallel search over the snapshot.
         """
-        engine = create_engine(self.database)
-        with Session(engine) as session:
-            query = select(distinct(column))
-            results = session.execute(query).all()
-        return [result[0] for result in results]
+        with self.parallel_search_lock:
+            if self.parallel_search is None or self.parallel_search.source is not source:
+                self.parallel_search = ParallelSearch(source)
+            return self.parallel_search
 
-    def fetch_commands(self):
+    def add_search_results(self, search_id, matching_commands):
         """
-        Fetch and return all command entries from the database,
-        ordered by their IDs in descending order.
+        Append commands found by a parallel search to the list view.
 
-        Returns:
-            list: A list of ShellCommand objects representing the command entries.
+        Args:
+            search_id (int): The ID of the search, results of outdated searches
+                are discarded.
+            matching_commands (list): The matching ShellCommand objects.
         """
-        engine = create_engine(self.database)
-        with Session(engine) as session:
-            query = select(ShellCommand).order_by(desc(ShellCommand.id))
-            results = session.execute(query).all()
+        if search_id != self.search_id or not matching_commands:
+            return
 
-        return [result[0] for result in results]
+        self.filtered_commands.extend(matching_commands)
 
-    def get_filtered_commands(self):
+        command_list_view = self.get_main_screen_widget("command_list_view")
+        command_list_view.extend(CommandListItem(command) for command in matching_commands)
+        if command_list_view.index is None:
+            command_list_view.index = 0
+
+    def finish_search(self, search_id):
         """
-        Filter the command list based on selected usernames, hosts, and a search string.
+        Mark a parallel search as finished and update the status bar.
 
-        Returns:
-            list: A list of filtered ShellCommand objects.
+        Args:
+            search_id (int): The ID of the search.
         """
-        return [command for command in self.commands if self.command_matches_filters(command)]
+        if search_id != self.search_id:
+            return
+
+        self.searching = False
+        self.update_status_bar()
 
     def command_matches_filters(self, command):
         """
@@ -125,7 +240,7 @@ class CommandHistory(App):
         if not command.host in self.selected_hosts:
             return False
 
-        if self.search_string and not self.command_does_match(command.command):
+        if self.search_string and not self.command_does_match(command.preview):
             return False
 
         return True
@@ -164,6 +279,142 @@ class CommandHistory(App):
         )
         yield Footer()
 
+    def on_mount(self):
+        """
+        Called when the app is mounted. Starts loading the full history if only
+        the first page is loaded and starts polling for new commands.
+        """
+        if self.loading_progress is not None:
+            self.load_history()
+        self.set_interval(self.LIVE_TAIL_INTERVAL, self.poll_new_commands)
+
+    @work(thread=True)
+    def load_history(self):
+        """
+        Load the full history, usernames and hosts in a thread.
+
+        The first page stays usable while the history is loading, the progress
+        is shown in the status bar.
+        """
+        history = self.command_cache.fetch_history(
+            lambda loaded, total: self.call_from_thread(
+                self.update_loading_progress, loaded, total
+            )
+        )
+        self.call_from_thread(self.finish_loading, *history)
+
+    def update_loading_progress(self, loaded, total):
+        """
+        Update the loading progress shown in the status bar.
+
+        Args:
+            loaded (int): The number of loaded commands.
+            total (int): The total number of commands.
+        """
+        self.loading_progress = (loaded, total)
+        self.update_status_bar()
+
+    def finish_loading(self, commands, usernames, hosts):
+        """
+        Replace the first page with the full history and update the views.
+
+        The highlighted command stays highlighted. If a time range or the frecency
+        order was selected in the meantime, the displayed commands are kept.
+
+        Args:
+            commands (list): The ShellCommand objects of the full history, newest first.
+            usernames (list): The distinct usernames.
+            hosts (list): The distinct hosts.
+        """
+        first_page = self.command_cache.commands
+        self.command_cache.set_history(commands, usernames, hosts)
+        self.loading_progress = None
+        self.merge_facets()
+
+        if self.commands is first_page:
+            command_list_view = self.get_main_screen_widget("command_list_view")
+            highlighted = command_list_view.highlighted_child
+
+            self.commands = self.command_cache.commands
+            self.filtered_commands = self.get_filtered_commands()
+
+            index = 0
+            if highlighted is not None:
+                index = next(
+                    (
+                        index for index, command in enumerate(self.filtered_commands)
+                        if command.id == highlighted.command.id
+                    ),
+                    0
+                )
+            self.refresh_command_list_view(index)
+
+        self.update_status_bar()
+
+    def merge_facets(self):
+        """
+        Add usernames and hosts of the cache that are missing in the app.
+
+        If all users or hosts are selected, the selection is the same list, so
+        the added values are selected as well.
+        """
+        for username in self.command_cache.usernames:
+            if username not in self.usernames:
+                self.usernames.append(username)
+        for host in self.command_cache.hosts:
+            if host not in self.hosts:
+                self.hosts.append(host)
+
+    @work(thread=True, exclusive=True)
+    def poll_new_commands(self):
+        """
+        Fetch commands added since the history was loaded.
+
+        Only commands with an ID larger than the largest loaded ID are fetched,
+        which is a cheap query on the primary key. The query runs in a thread,
+        the new commands are added in the thread of the app. Nothing is fetched
+        while the full history is loading.
+        """
+        if self.loading_progress is not None:
+            return
+
+        new_commands = self.command_cache.fetch_commands(self.command_cache.max_id)
+        if new_commands:
+            self.call_from_thread(self.add_new_commands, new_commands)
+
+    def add_new_commands(self, new_commands):
+        """
+        Merge new commands into the history and the displayed list.
+
+        The commands matching the current filters are inserted at the top of the
+        list view without rebuilding it, the highlighted command stays the same.
+        New commands are not shown if the time range ends in the past or the
+        commands are ordered by frecency.
+
+        Args:
+            new_commands (list): The new ShellCommand objects, newest first.
+        """
+        new_commands = self.command_cache.add_commands(new_commands)
+        if not new_commands:
+            return
+
+        self.merge_facets()
+
+        if self.commands is not self.command_cache.commands:
+            if self.time_to is not None or self.order_by_frecency:
+                return
+            self.commands[:0] = new_commands
+
+        new_filtered_commands = [
+            command for command in new_commands if self.command_matches_filters(command)
+        ]
+        self.filtered_commands[:0] = new_filtered_commands
+
+        command_list_view = self.get_main_screen_widget("command_list_view")
+        command_list_view.prepend(
+            CommandListItem(command) for command in new_filtered_commands
+        )
+
     def get_list_items(self):
         """
         Generate a sequence of CommandListItem objects based on filtered commands.
@@ -202,23 +453,55 @@ class CommandHistory(App):
         else:
             strings.append("Selected Hosts: [*]")
 
+        if self.order_by_frecency:
+            strings.append("Order: Frecent")
+
+        if self.loading_progress is not None:
+            loaded, total = self.loading_progress
+            strings.append(f"Loading History: {loaded}/{total or '?'}")
+
+        if self.time_from is not None or self.time_to is not None:
+            time_from = self.format_time_range_bound(self.time_from)
+            time_to = self.format_time_range_bound(self.time_to)
+            strings.append(
+                f"Time Range: {time_from} - {time_to}"
+            )
+
         if self.search_string:
             strings.append(
                 f"Search String: {self.search_string}"
             )
 
+        if self.searching:
+            strings.append("Searching...")
+
         return ", ".join(strings)
 
+    def format_time_range_bound(self, time):
+        """
+        Format a bound of the time range in local time for the status bar.
+
+        Args:
+            time (datetime | None): The bound in the clock of the database.
+
+        Returns:
+            str: The formatted local time, or "*" if the range is open.
+        """
+        if time is None:
+            return "*"
+        return format_local_time(time, self.database_tz)
+
     def on_list_view_selected(self, event: ListView.Selected):
         """
         Handle the event when an item is selected from the ListView.
 
-        This method writes the selected command to a temporary file and then exits the application.
+        This method writes the full text of the selected command to a temporary file
+        and then exits the application.
 
         Args:
             event (ListView.Selected): The selection event containing the selected item.
         """
-        command = event.item.command.command
+        command = self.command_cache.fetch_full_command(event.item.command)
         with open(self.tmp_file, "w") as f:
             f.write(command)
 
@@ -258,6 +541,9 @@ class CommandHistory(App):
             selected_usernames (list): The list of selected usernames.
         """
         self.selected_usernames = selected_usernames
+        if self.order_by_frecency:
+            # The frecent commands are fetched per user
+            self.commands = self.load_commands()
         self.filtered_commands = self.get_filtered_commands()
         self.refresh_command_list_view()
         self.update_status_bar()
@@ -301,16 +587,33 @@ class CommandHistory(App):
             index (int): The index of the item to be focused after refreshing.
                 Defaults to 0.
         """
-        command_list_view = self.get_child_by_id(id="command_list_view")
+        command_list_view = self.get_main_screen_widget("command_list_view")
         command_list_view.clear()
         command_list_view.extend(self.get_list_items())
+        command_list_view.load_until(index)
         command_list_view.index = index
 
+    def get_main_screen_widget(self, widget_id):
+        """
+        Return a widget of the main screen by its id.
+
+        `get_child_by_id` of the app searches the active screen, which is a modal
+        screen while e.g. the search is open. New commands and the full history
+        may be added in the meantime, so the main screen is searched explicitly.
+
+        Args:
+            widget_id (str): The id of the widget.
+
+        Returns:
+            Widget: The widget with the given id.
+        """
+        return self.screen_stack[0].get_child_by_id(widget_id)
+
     def update_status_bar(self):
         """
         Update the status bar with the current status string.
         """
-        status_bar = self.get_child_by_id(id="status_bar")
+        status_bar = self.get_main_screen_widget("status_bar")
         status_bar.update(self.get_status_string())
 
     def action_show_info(self):
@@ -321,9 +624,12 @@ class CommandHistory(App):
         and pushes an InfoScreen to display its details. It also sets maybe_delete_entry
         as the callback to handle potential deletion of the command.
         """
-        command_list_view = self.get_child_by_id(id="command_list_view")
+        command_list_view = self.get_main_screen_widget("command_list_view")
         command = self.filtered_commands[command_list_view.index]
-        self.push_screen(InfoScreen(command), self.maybe_delete_entry)
+        self.push_screen(
+            InfoScreen(command, self.command_cache.fetch_full_command(command)),
+            self.maybe_delete_entry
+        )
 
     def maybe_delete_entry(self, delete_entry):
         """
@@ -346,11 +652,11 @@ class CommandHistory(App):
         """
         Delete the selected command from both the UI and the database.
         """
-        command_list_view = self.get_child_by_id(id="command_list_view")
+        command_list_view = self.get_main_screen_widget("command_list_view")
         index = command_list_view.index
         command = self.filtered_commands[index]
 
-        self.delete_command_from_database(command)
+        run_with_retry(self.delete_command_from_database, command)
         self.delete_command_from_lists(command)
 
         # Refresh the command list view and adjust the selection
@@ -359,13 +665,13 @@ class CommandHistory(App):
 
     def delete_command_from_database(self, command):
         """
-        Delete a command from the database.
+        Delete a command from the database and remove it from the frecency table.
 
         Args:
             command (ShellCommand): The command object to be deleted.
         """
-        engine = create_engine(self.database)
-        with Session(engine) as session:
+        with Session(self.command_cache.engine) as session:
+            remove_command(session, command)
             delete_query = delete(ShellCommand).where(
                 ShellCommand.id == command.id)
             session.execute(delete_query)
@@ -379,7 +685,9 @@ class CommandHistory(App):
             command (ShellCommand): The command object to be removed.
         """
         self.filtered_commands.remove(command)
-        self.commands.remove(command)
+        if self.commands is not self.command_cache.commands:
+            self.commands.remove(command)
+        self.command_cache.remove(command)
 
     def action_search(self):
         """
@@ -410,3 +718,122 @@ class CommandHistory(App):
         self.refresh_command_list_view()
 
         self.update_status_bar()
+
+    def action_select_time_range(self):
+        """
+        Trigger an action to select the time range of the displayed commands.
+
+        This method pushes a TimeRangeScreen onto the application's screen stack.
+        Relative ranges are based on the current time of the database, since the
+        command times are set by the database. Upon selection, `set_time_range`
+        is called to update the application state.
+        """
+        now = self.command_cache.fetch_current_time()
+        self.database_tz = database_timezone(now)
+        self.push_screen(
+            TimeRangeScreen(now, self.time_from, self.time_to),
+            self.set_time_range
+        )
+
+    def set_time_range(self, time_range):
+        """
+        Set the time range, fetch the matching commands and update the views.
+
+        Selecting a time range switches back to ordering the commands by recency.
+
+        Args:
+            time_range (tuple | None): A tuple (time_from, time_to), where each bound
+                may be None, or None to keep the current time range.
+        """
+        if time_range is None or time_range == (self.time_from, self.time_to):
+            return
+
+        self.time_from, self.time_to = time_range
+        self.order_by_frecency = False
+        self.commands = self.load_commands()
+
+        self.filtered_commands = self.get_filtered_commands()
+        self.refresh_command_list_view()
+        self.update_status_bar()
+
+    def action_jump_to_date(self):
+        """
+        Initiate the action to jump to a date in the command list.
+
+        This method pushes a JumpToDateScreen onto the application's screen stack
+        and sets `jump_to_date` as the callback. The current time of the database
+        is passed to convert the entered date to the clock of the database.
+        """
+        self.push_screen(
+            JumpToDateScreen(self.command_cache.fetch_current_time()),
+            self.jump_to_date
+        )
+
+    def jump_to_date(self, date):
+        """
+        Move the selection to the newest displayed command run at or before a date.
+
+        Args:
+            date (datetime | None): The date to jump to, or None to do nothing.
+        """
+        if date is None:
+            return
+
+        index = next(
+            (
+                index for index, command in enumerate(self.filtered_commands)
+                if command.time is not None and command.time <= date
+            ),
+            None
+        )
+        if index is None:
+            self.notify("No command found before this date.")
+            return
+
+        command_list_view = self.get_main_screen_widget("command_list_view")
+        command_list_view.load_until(index)
+        command_list_view.index = index
+
+    def load_commands(self):
+        """
+        Load the commands for the current order and time range.
+
+        Commands ordered by frecency are read from the frecency table, limited to
+        the most frecent commands of the selected users. A time range is evaluated
+        by the database, so only the commands within the range are loaded.
+        Otherwise the cached history is used.
+
+        Returns:
+            list: A list of ShellCommand objects.
+        """
+        if self.order_by_frecency:
+            with Session(self.command_cache.engine) as session:
+                return fetch_frecent_commands(
+                    session,
+                    self.selected_usernames,
+                    self.FRECENT_COMMANDS_LIMIT
+                )
+
+        if self.time_from is None and self.time_to is None:
+            return self.command_cache.commands
+
+        return self.command_cache.fetch_commands(
+            time_from=self.time_from,
+            time_to=self.time_to
+        )
+
+    def action_toggle_frecency_order(self):
+        """
+        Toggle between ordering the commands by recency and by frecency.
+
+        Ordering by frecency shows the most recent use of the commands that were
+        run most often and most recently first. It resets the time range.
+        """
+        self.order_by_frecency = not self.order_by_frecency
+        self.time_from = None
+        self.time_to = None
+        self.commands = self.load_commands()
+
+        self.filtered_commands = self.get_filtered_commands()
+        self.refresh_command_list_view()
+        self.update_status_bar()
@@ -1,20 +1,94 @@
-from textual.containers import Horizontal
-from textual.widgets import Label, ListItem
+from collections import OrderedDict
+
+from rich.text import Text
+from textual.widgets import ListItem
+
+
+def column_widths(width):
+    """
+    Compute the widths of the user name, host and command columns.
+
+    The user name and host take 10% of the width each, the command the rest.
+
+    Args:
+        width (int): The width of the row in cells.
+
+    Returns:
+        tuple: The widths of the user name, host and command columns in cells.
+    """
+    user_name_width = host_width = width // 10
+    return user_name_width, host_width, width - user_name_width - host_width
 
 
 class CommandListItem(ListItem):
     """
     Custom list item widget for displaying a command.
 
-    Displays command information in a horizontal layout, with each part of the
-    command (user name, host, command text) styled separately via CSS.
+    Displays the user name, host and command text of a command in columns as
+    a single pre-styled Rich Text, instead of composing a widget per column.
+    The rendered rows are cached by command ID and width, so they are only
+    rendered again after a resize.
     """
+    # Styles of the user name, host and command columns
+    USER_NAME_STYLE = "bold"
+    HOST_STYLE = "italic"
+    COMMAND_STYLE = ""
+
+    # Maximum number of rendered rows kept in the cache
+    ROW_CACHE_SIZE = 4096
+
+    _row_cache = OrderedDict()
+
     def __init__(self, command):
         super().__init__()
         self.command = command
 
-    def compose(self):
-        with Horizontal():
-            yield Label(self.command.user_name, id="user_name")
-            yield Label(self.command.host, id="host")
-            yield Label(self.command.command, id="command")
+    def render(self):
+        """
+        Render the row, using the cached row if the width did not change.
+
+        Returns:
+            Text: The row with the user name, host and command columns.
+        """
+        key = (self.command.id, self.size.width)
+        row = self._row_cache.get(key)
+        if row is None:
+            row = self.render_row(self.size.width)
+            self._row_cache[key] = row
+            if len(self._row_cache) > self.ROW_CACHE_SIZE:
+                self._row_cache.popitem(last=False)
+        else:
+            # Keep recently shown rows, only the least recently used are evicted
+            self._row_cache.move_to_end(key)
+        return row
+
+    def render_row(self, width):
+        """
+        Render the columns of the row, truncating each column to its width.
+
+        Line breaks in the command are shown as symbols, so every row has a
+        height of one line. Long commands show their preview.
+
+        Args:
+            width (int): The width of the row in cells.
+
+        Returns:
+            Text: The row with the user name, host and command columns.
+        """
+        command_text = self.command.preview.replace("\n", " ⏎ ")
+        if self.command.is_truncated:
+            command_text += "…"
+
+        row = Text(no_wrap=True, end="")
+        columns = (
+            (self.command.user_name, self.USER_NAME_STYLE),
+            (self.command.host, self.HOST_STYLE),
+            (command_text, self.COMMAND_STYLE),
+        )
+        for (value, style), column_width in zip(columns, column_widths(width)):
+            # Keep one cell free as a gap to the next column
+            column = Text(value or "", style=style)
+            column.truncate(max(column_width - 1, 0), overflow="ellipsis", pad=True)
+            row.append_text(column)
+            row.append(" ")
+        return row
@@ -13,16 +13,20 @@ class InfoScreen(ModalScreen):
 
     Attributes:
         command (ShellCommand): The command object containing information to display.
+        command_text (str): The full text of the command.
     """
-    def __init__(self, command):
+    def __init__(self, command, command_text):
         """
         Initializes the InfoScreen with the specified command.
 
         Args:
             command (ShellCommand): The command object whose details are to be displayed.
+            command_text (str): The full text of the command, the command object only
+                holds a preview of long commands.
         """
         super().__init__()
         self.command = command
+        self.command_text = command_text
 
     def compose(self):
         """
@@ -36,7 +40,7 @@ class InfoScreen(ModalScreen):
             yield Label(f"Path: {self.command.path}")
             yield Label(f"Venv: {self.command.venv}")
             yield Label(f"Time: {self.command.time}")
-            yield Label(f"Command: {self.command.command}")
+            yield Label(f"Command: {self.command_text}")
             with Container():
                 yield Button("Close", id="close")
                 yield Button.error("Delete", id="delete")
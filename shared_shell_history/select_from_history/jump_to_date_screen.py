@@ -0,0 +1,57 @@
+from textual import on
+from textual.screen import ModalScreen
+from textual.widgets import Input
+
+from .time_range_screen import database_timezone, parse_datetime, to_database_time
+
+
+class JumpToDateScreen(ModalScreen):
+    """
+    A screen for inputting a date to jump to in the command list.
+
+    The screen is dismissed with the entered date, or with None if the input
+    is empty. Dates without a time refer to the end of that day, so jumping
+    to a date shows the last command run on that day first. The date is
+    entered in local time and converted to the clock of the database.
+
+    Attributes:
+        database_tz (tzinfo): The time zone of the database clock.
+    """
+    def __init__(self, now):
+        """
+        Initializes the JumpToDateScreen with the current time of the database.
+
+        Args:
+            now (datetime): The current time of the database.
+        """
+        super().__init__()
+        self.database_tz = database_timezone(now)
+
+    def compose(self):
+        """
+        Composes the screen with an Input widget for entering the date.
+        """
+        yield Input(placeholder="Jump to date (YYYY-MM-DD [HH:MM])...")
+
+    @on(Input.Submitted)
+    def close(self, event):
+        """
+        Handles the event when the date is submitted.
+
+        Closes the screen and returns the entered date. The screen stays open
+        if the date is invalid.
+
+        Args:
+            event: The event object containing the submitted input.
+        """
+        text = self.query_one(Input).value
+        if not text.strip():
+            self.dismiss(None)
+            return
+
+        date = parse_datetime(text, end_of_day=True)
+        if date is None:
+            self.notify("Invalid date, use the format YYYY-MM-DD [HH:MM].", severity="error")
+            return
+
+        self.dismiss(to_database_time(date, self.database_tz))
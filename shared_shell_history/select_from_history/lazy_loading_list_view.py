@@ -13,6 +13,8 @@ class LazyLoadingListView(ListView):
     Attributes:
         _full_children (list): A list of all items to be loaded.
         _batch_size (int): The number of items to load in each batch.
+        _loaded_count (int): The number of items of `_full_children` passed
+            to the ListView so far.
     """
     def __init__(
         self,
@@ -24,11 +26,12 @@ class LazyLoadingListView(ListView):
         disabled: bool = False,
         batch_size: int = 64
     ) -> None:
-        self._full_children = children
+        self._full_children = list(children)
         self._batch_size = batch_size
+        self._loaded_count = min(len(children), 2 * self._batch_size)
 
         super().__init__(
-            *children[:2 * self._batch_size],
+            *children[:self._loaded_count],
             initial_index=initial_index,
             name=name,
             id=id,
@@ -40,8 +43,12 @@ class LazyLoadingListView(ListView):
     def _loaded_items(self):
         """
         The number of items that have been loaded so far.
+
+        The items are counted when they are passed to the ListView instead of
+        counting its nodes. Clearing the ListView removes its nodes only after
+        the next refresh, while new items are loaded right away.
         """
-        return len(self._nodes)
+        return self._loaded_count
 
     def watch_index(self, old_index: int | None, new_index: int | None) -> None:
         """
@@ -72,6 +79,19 @@ class LazyLoadingListView(ListView):
             new_index
         )
 
+    def load_until(self, index):
+        """
+        Load batches of items until the item at the given index is loaded.
+
+        The index of a ListView is limited to the loaded items, so this has to
+        be called before jumping to an item that has not been loaded yet.
+
+        Args:
+            index (int): The index of the item that has to be loaded.
+        """
+        if index >= self._loaded_items:
+            self._load_batches((index - self._loaded_items) // self._batch_size + 1)
+
     def _load_batches(self, number_of_batches):
         """
         Load a specified number of batches of items.
@@ -90,6 +110,7 @@ class LazyLoadingListView(ListView):
             self._loaded_items:self._loaded_items + number_of_batches * self._batch_size
         ]
 
+        self._loaded_count += len(items_to_load)
         super().extend(
             items_to_load
         )
@@ -99,27 +120,52 @@ class LazyLoadingListView(ListView):
         Clear the list view and reset the full children list.
         """
         self._full_children = []
+        self._loaded_count = 0
         return super().clear()
 
     def extend(self, items):
         """
         Extend the list view with new items.
 
-        This method extends the list view with new items. If the list view
-        is not empty, it raises a NotImplementedError. The case of non-empty
-        list views is not needed here so far.
+        The items are appended to the full children list. Only the items within
+        the first two batches are mounted right away, the others are loaded
+        lazily when the index gets close to them.
 
         Args:
             items (list): A list of items to be added to the list view.
         """
-        if len(self._full_children) != 0:
-            raise NotImplementedError(
-                "extend was only implemented for the empty LazyLoadingListView."
-            )
-
         self._full_children.extend(items)
-        items_to_load = self._full_children[:2 * self._batch_size]
+        items_to_load = self._full_children[self._loaded_items:2 * self._batch_size]
+        self._loaded_count += len(items_to_load)
 
         return super().extend(
             items_to_load
         )
+
+    def prepend(self, items):
+        """
+        Insert new items at the top of the list view.
+
+        The new items are mounted before the loaded items, so the list view does
+        not have to be rebuilt. The index is shifted by the number of new items,
+        so the highlighted item stays the same.
+
+        Args:
+            items (list): A list of items to be inserted at the top of the list view.
+        """
+        items = list(items)
+        if not items:
+            return
+
+        self._full_children[:0] = items
+        if self._loaded_items == 0:
+            items_to_load = items[:2 * self._batch_size]
+            self._loaded_count = len(items_to_load)
+            super().extend(items_to_load)
+            return
+
+        index = self.index
+        self._loaded_count += len(items)
+        self.mount(*items, before=0)
+        if index is not None:
+            self.index = index + len(items)
@@ -0,0 +1,215 @@
+import multiprocessing
+import os
+import re
+import sys
+import weakref
+from contextlib import redirect_stderr
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+# Separates the command texts in the shared buffer, commands can not contain it
+SEPARATOR = "\0"
+
+# Lone surrogates are kept, texts read from the database may contain them
+ENCODING_ERRORS = "surrogatepass"
+
+# Number of shards per worker, more shards stream results in smaller steps
+SHARDS_PER_WORKER = 4
+
+# The shared memory of the texts, attached once in every worker process
+_worker_memory = None
+
+
+def _attach_shared_memory(name):
+    """
+    Attach a worker process to the shared memory holding the command texts.
+
+    Args:
+        name (str): The name of the shared memory block.
+    """
+    global _worker_memory
+    _worker_memory = SharedMemory(name=name)
+
+
+def _search_shard(pattern, start, end, first_index):
+    """
+    Search the command texts of one shard of the shared buffer.
+
+    Args:
+        pattern (str): The regular expression to search for.
+        start (int): The offset of the first byte of the shard.
+        end (int): The offset after the last byte of the shard.
+        first_index (int): The index of the first command of the shard.
+
+    Returns:
+        list: The indices of the matching commands in ascending order.
+    """
+    search = re.compile(pattern).search
+    texts = bytes(_worker_memory.buf[start:end]).decode(errors=ENCODING_ERRORS).split(SEPARATOR)
+    return [first_index + index for index, text in enumerate(texts) if search(text)]
+
+
+def _release(executor, memory):
+    """
+    Shut down the worker processes and free the shared memory.
+
+    Args:
+        executor (ProcessPoolExecutor): The pool of worker processes.
+        memory (SharedMemory): The shared memory holding the command texts.
+    """
+    executor.shutdown(cancel_futures=True)
+    memory.close()
+    memory.unlink()
+
+
+class ParallelSearch:
+    """
+    A regular expression search over many commands using all CPU cores.
+
+    The command texts are copied once into a shared memory buffer, which the
+    worker processes attach to when they are started. A query only sends the
+    pattern and the byte range of a shard to a worker, so the texts are not
+    pickled per query. The results of the shards are returned in the order of
+    the commands, so results can be consumed while later shards are searched.
+
+    The searched commands are a snapshot, commands added or removed later
+    are not reflected in the results.
+
+    Attributes:
+        source (list): The list of ShellCommand objects the snapshot was taken of.
+        commands (list): The snapshot of the ShellCommand objects that are searched.
+    """
+    def __init__(self, commands, workers=None):
+        """
+        Initializes the ParallelSearch, copies the command texts to shared
+        memory and starts the worker processes.
+
+        Args:
+            commands (list): The ShellCommand objects to be searched.
+            workers (int, optional): The number of worker processes. Defaults
+                to the number of CPU cores.
+        """
+        self.source = commands
+        self.commands = list(commands)
+        workers = workers or os.cpu_count() or 1
+
+        # Textual captures sys.stderr, but the helper processes of multiprocessing
+        # need a real file descriptor for it
+        with redirect_stderr(sys.__stderr__):
+            self._create_shared_memory(workers * SHARDS_PER_WORKER)
+            self._start_workers(workers)
+
+    def _create_shared_memory(self, number_of_shards):
+        """
+        Copy the command texts of all shards into a new shared memory block.
+
+        Args:
+            number_of_shards (int): The number of shards to split into.
+        """
+        encoded_shards = self._encode_shards(number_of_shards)
+        size = sum(len(encoded_shard) for encoded_shard in encoded_shards.values())
+        self._memory = SharedMemory(create=True, size=max(size, 1))
+
+        self._shards = []
+        offset = 0
+        for first_index, encoded_shard in encoded_shards.items():
+            end = offset + len(encoded_shard)
+            self._memory.buf[offset:end] = encoded_shard
+            self._shards.append((offset, end, first_index))
+            offset = end
+
+    def _start_workers(self, workers):
+        """
+        Start the worker processes and wait until they are ready.
+
+        Args:
+            workers (int): The number of worker processes.
+        """
+        # Fork the workers from a clean server process instead of the app,
+        # which already runs threads of its own
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([__name__])
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_attach_shared_memory,
+            initargs=(self._memory.name,)
+        )
+        self._finalizer = weakref.finalize(self, _release, self._executor, self._memory)
+
+        # All workers are started with the first task
+        self._executor.submit(int).result()
+
+    @property
+    def max_id(self):
+        """
+        The largest command ID in the snapshot, or 0 if it is empty.
+        """
+        return self.commands[0].id if self.commands else 0
+
+    def _encode_shards(self, number_of_shards):
+        """
+        Split the commands into shards of about the same number of commands
+        and encode the joined texts of every shard.
+
+        Args:
+            number_of_shards (int): The number of shards to split into.
+
+        Returns:
+            dict: The encoded texts of the shards, keyed by the index of their first command.
+        """
+        texts = [command.preview for command in self.commands]
+        shard_size = max(-(-len(texts) // number_of_shards), 1)
+        return {
+            first_index: SEPARATOR.join(
+                texts[first_index:first_index + shard_size]
+            ).encode(errors=ENCODING_ERRORS)
+            for first_index in range(0, len(texts), shard_size)
+        }
+
+    def search(self, pattern):
+        """
+        Search all commands for a regular expression.
+
+        Args:
+            pattern (str): The regular expression to search for.
+
+        Yields:
+            ShellCommand: The matching commands, in the order of `commands`.
+
+        Raises:
+            re.error: If the pattern is not a valid regular expression.
+        """
+        for shard_commands in self.search_shards(pattern):
+            yield from shard_commands
+
+    def search_shards(self, pattern):
+        """
+        Search all commands for a regular expression, shard by shard.
+
+        All shards are submitted at once, the results are yielded as soon as
+        the shard and all shards before it have been searched.
+
+        Args:
+            pattern (str): The regular expression to search for.
+
+        Yields:
+            list: The matching commands of each shard, in the order of `commands`.
+
+        Raises:
+            re.error: If the pattern is not a valid regular expression.
+        """
+        re.compile(pattern)
+
+        futures = [
+            self._executor.submit(_search_shard, pattern, *shard)
+            for shard in self._shards
+        ]
+        for future in futures:
+            yield [self.commands[index] for index in future.result()]
+
+    def close(self):
+        """
+        Shut down the worker processes and free the shared memory.
+        """
+        self._finalizer()
@@ -0,0 +1,80 @@
+import argparse
+import json
+import os
+import signal
+import socket
+import sys
+
+# Only the standard library is imported here, the client has to start fast.
+FORWARDED_ENVIRONMENT = ("TERM", "COLORTERM", "LANG", "LC_ALL", "NO_COLOR")
+
+
+def forward_signal_to(pid):
+    """
+    Create a signal handler that forwards the received signal to a process.
+
+    Args:
+        pid (int): The ID of the process the signal is forwarded to.
+
+    Returns:
+        Callable: The signal handler.
+    """
+    def forward_signal(signum, frame):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+    return forward_signal
+
+
+def main():
+    """Entry point of the picker client.
+
+    Asks a running picker server to open the picker on the terminal of this
+    process. The selected command is written to the temporary file by the
+    picker. Exits with status 1 if no server is available, so the caller can
+    fall back to starting the picker directly.
+
+    The picker is not in the foreground process group of the terminal, so
+    SIGWINCH received by this process is forwarded to it while it runs.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--socket", type=str, required=True)
+    parser.add_argument("--tmp_file", type=str, required=True)
+    parser.add_argument("--user", type=str, default=None)
+    arguments = parser.parse_args()
+
+    request = {
+        "tty": os.ttyname(sys.stdin.fileno()),
+        "tmp_file": arguments.tmp_file,
+        "user": arguments.user,
+        "environment": {
+            name: os.environ[name]
+            for name in FORWARDED_ENVIRONMENT
+            if name in os.environ
+        },
+    }
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(arguments.socket)
+        except OSError:
+            sys.exit(1)
+
+        client.sendall(json.dumps(request).encode() + b"\n")
+        with client.makefile() as response:
+            reply = json.loads(response.readline() or "{}")
+            if reply.get("status") == "started":
+                signal.signal(signal.SIGWINCH, forward_signal_to(reply["pid"]))
+                reply = json.loads(response.readline() or "{}")
+
+    if reply.get("status") != "ok":
+        print(
+            f"shared_shell_history: Picker server failed: {reply.get('message')}",
+            file=sys.stderr
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
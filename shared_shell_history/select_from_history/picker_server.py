@@ -0,0 +1,270 @@
+import argparse
+import fcntl
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+
+# Only the standard library is imported at module level. Every new shell starts
+# the server, so a server that is already running has to be detected before
+# Textual, SQLAlchemy and the command history are loaded.
+
+# Environment variables forwarded from the client's shell to the picker.
+FORWARDED_ENVIRONMENT = ("TERM", "COLORTERM", "LANG", "LC_ALL", "NO_COLOR")
+
+
+class PickerRequestHandler(socketserver.StreamRequestHandler):
+    """
+    Handles a single picker request of a client.
+
+    The request is a JSON line with the terminal of the client, the temporary
+    file the selected command is written to and the user to filter by. The
+    handler refreshes the command cache, forks a child that attaches to the
+    terminal of the client and runs the picker. It replies with a JSON line
+    with the process ID of the picker once it is started, so the client can
+    forward signals like SIGWINCH, and with another one once the picker has
+    been closed.
+    """
+    def handle(self):
+        """
+        Run the picker for the request of a client and send back the result.
+        """
+        line = self.rfile.readline()
+        if not line:
+            # The connection was only opened to check if the server is running.
+            return
+
+        try:
+            request = json.loads(line)
+            self.server.run_picker(
+                request,
+                started=lambda pid: self.send_reply({"status": "started", "pid": pid})
+            )
+        except Exception as exception:
+            self.send_reply({"status": "error", "message": str(exception)})
+        else:
+            self.send_reply({"status": "ok"})
+
+    def send_reply(self, reply):
+        """
+        Send a JSON reply to the client.
+
+        Args:
+            reply (dict): The reply to be sent.
+        """
+        self.wfile.write(json.dumps(reply).encode() + b"\n")
+
+
+class PickerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    A per-user server that keeps the picker warm.
+
+    The server keeps all imports loaded and the command history cached in
+    memory. For every request the cache is refreshed incrementally and a
+    picker is forked from the warm process, so the picker paints without
+    any startup cost. Commands deleted in a picker are reported back
+    through a pipe and removed from the cache.
+
+    Attributes:
+        database (str): The database connection string or path.
+        command_cache (CommandCache): The cached command history.
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path, database):
+        """
+        Initializes the PickerServer, loads the command history and binds the socket.
+
+        Args:
+            socket_path (str): The path of the Unix socket to listen on.
+            database (str): The database connection string or path.
+        """
+        from .command_cache import CommandCache
+
+        self.database = database
+        self.command_cache = CommandCache(database)
+        self.cache_lock = threading.Lock()
+
+        old_umask = os.umask(0o077)
+        try:
+            super().__init__(socket_path, PickerRequestHandler)
+        finally:
+            os.umask(old_umask)
+
+    def run_picker(self, request, started=None):
+        """
+        Fork a picker attached to the terminal of the client and wait for it.
+
+        Args:
+            request (dict): The request of the client.
+            started (Callable, optional): Called with the process ID of the
+                picker once it is forked.
+        """
+        with self.cache_lock:
+            self.command_cache.refresh()
+
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            self.run_picker_child(request, write_fd)
+
+        os.close(write_fd)
+        if started is not None:
+            started(pid)
+
+        with os.fdopen(read_fd) as pipe:
+            removed_ids = json.loads(pipe.read() or "[]")
+        _, status = os.waitpid(pid, 0)
+
+        with self.cache_lock:
+            self.command_cache.discard_ids(removed_ids)
+
+        if os.waitstatus_to_exitcode(status) != 0:
+            raise RuntimeError("The picker exited with an error.")
+
+    def run_picker_child(self, request, write_fd):
+        """
+        Run the picker in the forked child and exit.
+
+        The child attaches its standard streams to the terminal of the client
+        and reports the IDs of deleted commands through the pipe before exiting.
+        The server runs in its own session without a controlling terminal, so
+        the terminal of the client does not become the controlling terminal of
+        the child and its reads and writes are not blocked as a background
+        process group. SIGWINCH is forwarded by the client instead.
+
+        Args:
+            request (dict): The request of the client.
+            write_fd (int): The writing end of the pipe to the server.
+        """
+        from .command_history import CommandHistory
+
+        exit_status = 1
+        try:
+            self.socket.close()
+            # Connections of the server must not be shared with the child
+            self.command_cache.engine.dispose(close=False)
+
+            tty_fd = os.open(request["tty"], os.O_RDWR)
+            for fd in (0, 1, 2):
+                os.dup2(tty_fd, fd)
+            os.close(tty_fd)
+
+            for name in FORWARDED_ENVIRONMENT:
+                os.environ.pop(name, None)
+            os.environ.update(request.get("environment", {}))
+
+            app = CommandHistory(
+                database=self.database,
+                user=request.get("user"),
+                tmp_file=request["tmp_file"],
+                command_cache=self.command_cache
+            )
+            try:
+                app.run()
+            except SystemExit:
+                pass
+
+            exit_status = 0
+        finally:
+            with os.fdopen(write_fd, "w") as pipe:
+                pipe.write(json.dumps(self.command_cache.removed_ids))
+            os._exit(exit_status)
+
+
+def is_server_running(socket_path):
+    """
+    Check if a picker server is listening on the given socket.
+
+    Args:
+        socket_path (str): The path of the Unix socket.
+
+    Returns:
+        bool: True if a server accepts connections on the socket, False otherwise.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(socket_path)
+        except OSError:
+            return False
+    return True
+
+
+def detach_from_terminal():
+    """
+    Move the server into a new session without a controlling terminal.
+
+    The server is started in the background of a shell. In the process group
+    of that shell, a picker writing to the terminal of a client would be
+    stopped or fail with EIO as a background process group of the terminal.
+    """
+    if os.getpgrp() == os.getpid():
+        # A process group leader can not start a new session
+        if os.fork() != 0:
+            os._exit(0)
+    os.setsid()
+
+
+def lock_server(socket_path):
+    """
+    Take the lock of the picker server for the given socket.
+
+    The lock is held as long as the server runs, and released by the operating
+    system when it exits. Shells started at the same time therefore start at
+    most one server, the others exit before loading anything.
+
+    Args:
+        socket_path (str): The path of the Unix socket.
+
+    Returns:
+        file: The open lock file, or None if another server holds the lock.
+    """
+    lock_file = open(f"{socket_path}.lock", "w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+def main():
+    """Entry point of the picker server.
+
+    Parses command line arguments and serves picker requests until terminated.
+    Exits immediately if another server is already starting or listens on the
+    socket, before any of the heavy imports.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database", type=str, required=True)
+    parser.add_argument("--socket", type=str, required=True)
+    arguments = parser.parse_args()
+
+    detach_from_terminal()
+
+    lock_file = lock_server(arguments.socket)
+    if lock_file is None or is_server_running(arguments.socket):
+        sys.exit(0)
+
+    if os.path.exists(arguments.socket):
+        os.unlink(arguments.socket)
+
+    # Import everything the picker needs up front, so a forked picker starts
+    # without paying for the imports of Textual and SQLAlchemy.
+    import textual.drivers.linux_driver  # noqa: F401
+
+    from . import command_history  # noqa: F401
+
+    server = PickerServer(arguments.socket, arguments.database)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.unlink(arguments.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+from datetime import datetime, timedelta, timezone
+
+from textual import on
+from textual.binding import Binding
+from textual.containers import Container, Horizontal
+from textual.screen import ModalScreen
+from textual.widgets import Button, Input, Label
+
+# Relative time ranges offered by the TimeRangeScreen, keyed by button id.
+RELATIVE_TIME_RANGES = {
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+}
+
+
+def parse_datetime(text, end_of_day=False):
+    """
+    Parse a date or date and time given in ISO format, e.g. "2024-05-07 13:30".
+
+    Args:
+        text (str): The text to be parsed.
+        end_of_day (bool): If True and only a date is given, the end of that day
+            is returned instead of its start.
+
+    Returns:
+        datetime | None: The parsed datetime, or None if the text is empty or invalid.
+    """
+    text = text.strip()
+    try:
+        parsed = datetime.fromisoformat(text)
+    except ValueError:
+        return None
+
+    if end_of_day and len(text) == len("YYYY-MM-DD"):
+        parsed += timedelta(days=1)
+
+    return parsed
+
+
+def database_timezone(database_now):
+    """
+    Determine the time zone of the clock the database sets the command times with.
+
+    SQLite's CURRENT_TIMESTAMP is a naive time in UTC, PostgreSQL's is aware
+    and in the time zone of the session. For naive times the offset from UTC
+    is derived from the current time of the database.
+
+    Args:
+        database_now (datetime): The current time of the database.
+
+    Returns:
+        tzinfo: The time zone of the database clock.
+    """
+    if database_now.tzinfo is not None:
+        return database_now.tzinfo
+
+    offset = database_now - datetime.now(timezone.utc).replace(tzinfo=None)
+    quarter_hours = round(offset / timedelta(minutes=15))
+    return timezone(quarter_hours * timedelta(minutes=15))
+
+
+def to_database_time(local_time, database_tz):
+    """
+    Convert a naive local time entered by the user to the database clock.
+
+    Args:
+        local_time (datetime | None): The naive time in the local time zone.
+        database_tz (tzinfo): The time zone of the database clock.
+
+    Returns:
+        datetime | None: The naive time in the database clock.
+    """
+    if local_time is None:
+        return None
+    return local_time.astimezone(database_tz).replace(tzinfo=None)
+
+
+def to_local_time(database_time, database_tz):
+    """
+    Convert a time of the database clock to a naive local time for display.
+
+    Args:
+        database_time (datetime | None): The naive or aware time of the database.
+        database_tz (tzinfo): The time zone of the database clock.
+
+    Returns:
+        datetime | None: The naive time in the local time zone.
+    """
+    if database_time is None:
+        return None
+    if database_time.tzinfo is None:
+        database_time = database_time.replace(tzinfo=database_tz)
+    return database_time.astimezone().replace(tzinfo=None)
+
+
+def format_local_time(database_time, database_tz):
+    """
+    Format a time of the database clock as local time in the input format.
+
+    Args:
+        database_time (datetime): The naive or aware time of the database.
+        database_tz (tzinfo): The time zone of the database clock.
+
+    Returns:
+        str: The local time formatted as "YYYY-MM-DD HH:MM".
+    """
+    return to_local_time(database_time, database_tz).strftime("%Y-%m-%d %H:%M")
+
+
+class TimeRangeScreen(ModalScreen):
+    """
+    A screen for selecting the time range of the displayed commands.
+
+    The time range can either be one of the relative ranges (last hour, day
+    or week), the whole history, or an explicit range entered as dates in
+    local time, which are converted to the clock of the database.
+    The screen is dismissed with a tuple (time_from, time_to), where each
+    bound may be None, or with None if the screen is cancelled.
+
+    Attributes:
+        now (datetime): The current time of the database.
+        time_from (datetime | None): The currently selected start of the range.
+        time_to (datetime | None): The currently selected end of the range.
+    """
+    BINDINGS = [
+        Binding("escape", "cancel()", "Cancel"),
+    ]
+
+    def __init__(self, now, time_from, time_to):
+        """
+        Initializes the TimeRangeScreen with the current time and time range.
+
+        Args:
+            now (datetime): The current time of the database.
+            time_from (datetime | None): The currently selected start of the range.
+            time_to (datetime | None): The currently selected end of the range.
+        """
+        super().__init__()
+        self.now = now
+        self.database_tz = database_timezone(now)
+        self.time_from = time_from
+        self.time_to = time_to
+
+    def compose(self):
+        """
+        Composes the screen with buttons for the relative ranges and inputs
+        for an explicit range.
+        """
+        with Container():
+            with Horizontal():
+                yield Button("Last hour", id="hour")
+                yield Button("Last day", id="day")
+                yield Button("Last week", id="week")
+                yield Button("All", id="all")
+            yield Label("From (YYYY-MM-DD [HH:MM]):")
+            yield Input(placeholder="Start of the history", id="from")
+            yield Label("To (YYYY-MM-DD [HH:MM]):")
+            yield Input(placeholder="End of the history", id="to")
+
+    def on_mount(self):
+        """
+        Called when the screen is mounted. Sets the inputs to the current range.
+        """
+        if self.time_from is not None:
+            self.query_one("#from", Input).value = format_local_time(self.time_from, self.database_tz)
+        if self.time_to is not None:
+            self.query_one("#to", Input).value = format_local_time(self.time_to, self.database_tz)
+
+    @on(Button.Pressed)
+    def button_pressed(self, event):
+        """
+        Handles button press events by dismissing with the selected relative range.
+
+        Args:
+            event: The event object containing the button pressed.
+        """
+        if event.button.id == "all":
+            self.dismiss((None, None))
+        else:
+            self.dismiss((self.now - RELATIVE_TIME_RANGES[event.button.id], None))
+
+    @on(Input.Submitted)
+    def input_submitted(self, event):
+        """
+        Handles the submission of an explicit range.
+
+        Dates without a time include the whole day for the end of the range.
+        The screen stays open if one of the entered dates is invalid.
+
+        Args:
+            event: The event object containing the submitted input.
+        """
+        from_text = self.query_one("#from", Input).value
+        to_text = self.query_one("#to", Input).value
+
+        time_from = parse_datetime(from_text)
+        time_to = parse_datetime(to_text, end_of_day=True)
+
+        if (from_text.strip() and time_from is None) or (to_text.strip() and time_to is None):
+            self.notify("Invalid date, use the format YYYY-MM-DD [HH:MM].", severity="error")
+            return
+
+        self.dismiss((
+            to_database_time(time_from, self.database_tz),
+            to_database_time(time_to, self.database_tz)
+        ))
+
+    def action_cancel(self):
+        """
+        Close the screen without changing the time range.
+        """
+        self.dismiss(None)
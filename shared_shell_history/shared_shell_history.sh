@@ -226,12 +226,163 @@ __latest_history_command() {
 }
 
 
+# shared_shell_history_update_capture_filters
+#
+# Compiles the capture filters from their configuration variables.
+#
+# The filters are compiled once when this script is sourced. Call this function after
+# changing one of the following variables, e.g. in config.sh, in a running shell:
+#   - SHARED_SHELL_HISTORY_IGNORE_DUPS: Drop a command equal to the previous one if non-empty.
+#     Defaults to 1.
+#   - SHARED_SHELL_HISTORY_IGNORE_SPACE: Drop commands starting with a space if non-empty.
+#     Defaults to 1.
+#   - SHARED_SHELL_HISTORY_IGNORE: Colon-separated list of glob patterns like HISTIGNORE,
+#     matching commands are dropped, e.g. "ls:cd:cd *:clear".
+#   - SHARED_SHELL_HISTORY_EXCLUDE_REGEX: Extended regular expression, matching commands
+#     are dropped.
+#   - SHARED_SHELL_HISTORY_REDACT_REGEX: Extended regular expression, matches are replaced
+#     by <redacted>. If the expression ends with a group, only that group is replaced,
+#     e.g. "[Pp][Aa][Ss][Ss][Ww][Oo][Rr][Dd]=([^[:space:]]+)". An expression starting
+#     with ^ only redacts its match at the start of the command.
+#
+# Usage:
+#   SHARED_SHELL_HISTORY_IGNORE="ls:cd:clear"
+#   shared_shell_history_update_capture_filters
+#
+shared_shell_history_update_capture_filters() {
+    __shared_shell_history_ignore_dups="${SHARED_SHELL_HISTORY_IGNORE_DUPS-1}"
+    __shared_shell_history_ignore_space="${SHARED_SHELL_HISTORY_IGNORE_SPACE-1}"
+    __shared_shell_history_exclude_regex="${SHARED_SHELL_HISTORY_EXCLUDE_REGEX:-}"
+    __shared_shell_history_redact_regex="${SHARED_SHELL_HISTORY_REDACT_REGEX:-}"
+
+    # Split the ignore list once, without globbing the patterns
+    __shared_shell_history_ignore_patterns=()
+    local rest="${SHARED_SHELL_HISTORY_IGNORE:-}"
+    while [[ -n "$rest" ]]; do
+        __shared_shell_history_ignore_patterns+=("${rest%%:*}")
+        [[ "$rest" == *:* ]] || break
+        rest="${rest#*:}"
+    done
+}
+
+shared_shell_history_update_capture_filters
+
+
+# Number of commands per outcome of the capture filters in this shell
+declare -A __shared_shell_history_capture_counts=(
+    [seen]=0 [duplicate]=0 [space]=0 [ignored]=0 [excluded]=0 [redacted]=0 [submitted]=0
+)
+
+# shared_shell_history_capture_stats
+#
+# Prints how many commands the capture filters dropped or redacted in this shell.
+#
+# 'seen' is the number of commands passed to the filters, 'submitted' the number of
+# commands sent to the database. The others count the commands dropped as duplicate,
+# for a leading space, by the ignore list or the exclude regex, and the redacted commands.
+#
+# Usage:
+#   shared_shell_history_capture_stats
+#
+shared_shell_history_capture_stats() {
+    local outcome
+    for outcome in seen duplicate space ignored excluded redacted submitted; do
+        printf '%-10s %d\n' "$outcome" "${__shared_shell_history_capture_counts[$outcome]}"
+    done
+}
+
+
+# __shared_shell_history_filter_command
+#
+# Applies the capture filters to a command before it is submitted to the database.
+#
+# The filters drop duplicates of the previous command, commands starting with a space,
+# commands matching the ignore list or the exclude regex, and redact matches of the
+# redact regex, see shared_shell_history_update_capture_filters. Only Bash builtins
+# are used, so no process is forked for dropped commands.
+#
+# Arguments:
+#   1. var: The name of the variable holding the command. Redactions are stored in it.
+#
+# Returns:
+#   - 0 (success) if the command should be submitted.
+#   - 1 (failure) if the command is dropped.
+#
+# Usage:
+#   if __shared_shell_history_filter_command command; then
+#       echo "Submitting: $command"
+#   fi
+#
+__shared_shell_history_filter_command() {
+    # The locals are prefixed, a local with the name of the caller's variable
+    # would hide it from printf -v
+    local __ssh_var=${1:?}
+    local __ssh_command="${!__ssh_var}"
+
+    (( ++__shared_shell_history_capture_counts[seen] ))
+
+    local __ssh_previous_command="${__shared_shell_history_last_command-}"
+    __shared_shell_history_last_command="$__ssh_command"
+
+    if [[ -n "$__shared_shell_history_ignore_dups" && "$__ssh_command" == "$__ssh_previous_command" ]]; then
+        (( ++__shared_shell_history_capture_counts[duplicate] ))
+        return 1
+    fi
+
+    if [[ -n "$__shared_shell_history_ignore_space" && "$__ssh_command" == [[:space:]]* ]]; then
+        (( ++__shared_shell_history_capture_counts[space] ))
+        return 1
+    fi
+
+    local __ssh_pattern
+    for __ssh_pattern in "${__shared_shell_history_ignore_patterns[@]}"; do
+        # shellcheck disable=SC2053 # the pattern is a glob like in HISTIGNORE
+        if [[ "$__ssh_command" == $__ssh_pattern ]]; then
+            (( ++__shared_shell_history_capture_counts[ignored] ))
+            return 1
+        fi
+    done
+
+    if [[ -n "$__shared_shell_history_exclude_regex" && "$__ssh_command" =~ $__shared_shell_history_exclude_regex ]]; then
+        (( ++__shared_shell_history_capture_counts[excluded] ))
+        return 1
+    fi
+
+    if [[ -n "$__shared_shell_history_redact_regex" && "$__ssh_command" =~ $__shared_shell_history_redact_regex ]]; then
+        local __ssh_redacted="" __ssh_rest="$__ssh_command" __ssh_match __ssh_secret
+        while [[ -n "$__ssh_rest" && "$__ssh_rest" =~ $__shared_shell_history_redact_regex && -n "${BASH_REMATCH[0]}" ]]; do
+            __ssh_match="${BASH_REMATCH[0]}"
+            __ssh_secret="${BASH_REMATCH[1]}"
+            __ssh_redacted+="${__ssh_rest%%"$__ssh_match"*}"
+            # The group is only known by its text, which may also occur earlier in
+            # the match, e.g. password=word. A group ending the match is replaced
+            # at the end, otherwise the whole match is replaced.
+            if [[ -n "$__ssh_secret" && "$__ssh_match" == *"$__ssh_secret" ]]; then
+                __ssh_redacted+="${__ssh_match:0:${#__ssh_match}-${#__ssh_secret}}<redacted>"
+            else
+                __ssh_redacted+="<redacted>"
+            fi
+            __ssh_rest="${__ssh_rest#*"$__ssh_match"}"
+            # The rest no longer starts at the start of the command
+            [[ "$__shared_shell_history_redact_regex" == ^* ]] && break
+        done
+        __ssh_command="$__ssh_redacted$__ssh_rest"
+        printf -v "$__ssh_var" '%s' "$__ssh_command"
+        (( ++__shared_shell_history_capture_counts[redacted] ))
+    fi
+
+    (( ++__shared_shell_history_capture_counts[submitted] ))
+    return 0
+}
+
+
 # __submit_last_command_to_database
 #
 # Submits the latest command from the Bash history to a PostgreSQL database.
 #
 # This function retrieves the most recent command entered in the Bash shell using the 
-# __latest_history_command function. It then calls an external script, 'submit_to_database.sh',
+# __latest_history_command function and passes it through the capture filters, see
+# __shared_shell_history_filter_command. It then calls an external script, 'submit_to_database.sh',
 # located in the SHARED_SHELL_HISTORY_BASE_DIR directory, passing it the database URL and the 
 # command to be submitted.
 #
@@ -241,10 +392,17 @@ __latest_history_command() {
 #   __submit_last_command_to_database
 #
 __submit_last_command_to_database() {
+    local command
+    command=$(__latest_history_command)
+
+    # Drop or redact the command before anything else is forked
+    if ! __shared_shell_history_filter_command command; then
+        return 0
+    fi
+
     local user="$USER"
     local host="$(hostname)"
     local path="$(realpath ${PWD})"
-    local command=$(__latest_history_command)
     local venv="$VIRTUAL_ENV"
 
     local script_path="${SHARED_SHELL_HISTORY_BASE_DIR}/insert_command.py"
@@ -355,10 +513,17 @@ search_and_insert_from_history() {
     local program_name="select_from_history"
     local tempfile=$(mktemp /tmp/command_XXXX)
 
-    run_python -m "$program_name" \
-	       --tmp_file "$tempfile" \
-	       --database "$SHARED_SHELL_HISTORY_DB_URL"\
-	       --user "$USER"
+    # Use the pre-warmed picker server if enabled, fall back to starting the picker
+    if [[ -z "${SHARED_SHELL_HISTORY_PICKER_SERVER:-}" ]] || \
+       ! run_python -m "${program_name}.picker_client" \
+		    --socket "$SHARED_SHELL_HISTORY_PICKER_SOCKET" \
+		    --tmp_file "$tempfile" \
+		    --user "$USER"; then
+	run_python -m "$program_name" \
+		   --tmp_file "$tempfile" \
+		   --database "$SHARED_SHELL_HISTORY_DB_URL"\
+		   --user "$USER"
+    fi
 
     local command=$(cat $tempfile)
     rm $tempfile
@@ -368,6 +533,33 @@ search_and_insert_from_history() {
 }
 
 
+# shared_shell_history_start_picker_server
+#
+# Starts the picker server in the background if it is not running yet.
+#
+# The picker server keeps Python, Textual, SQLAlchemy and the command history loaded,
+# so the interactive search menu opens without any startup delay. It listens on the
+# Unix socket SHARED_SHELL_HISTORY_PICKER_SOCKET, one server per user and host.
+# search_and_insert_from_history uses the server if SHARED_SHELL_HISTORY_PICKER_SERVER
+# is set and falls back to starting the menu directly if the server is not reachable.
+#
+# Usage:
+#   shared_shell_history_start_picker_server
+#
+shared_shell_history_start_picker_server() {
+    # Run in a subshell, so the server is not part of the job table of this shell
+    (run_python -m select_from_history.picker_server \
+		--database "$SHARED_SHELL_HISTORY_DB_URL" \
+		--socket "$SHARED_SHELL_HISTORY_PICKER_SOCKET" &>/dev/null &)
+}
+
+
+SHARED_SHELL_HISTORY_PICKER_SOCKET="${SHARED_SHELL_HISTORY_BASE_DIR}/picker-$(hostname).sock"
+
+if [[ -n "${SHARED_SHELL_HISTORY_PICKER_SERVER:-}" ]]; then
+    shared_shell_history_start_picker_server
+fi
+
 # init SHARED_SHELL_HISTORY_LAST_ID when sourcing this file the first time
 SHARED_SHELL_HISTORY_LAST_ID=$(__latest_history_id)
 
@@ -0,0 +1,99 @@
+import random
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
+
+# Milliseconds SQLite waits for a lock held by another connection
+SQLITE_BUSY_TIMEOUT_MS = 5000
+
+# Pragmas applied to every SQLite connection. WAL lets readers and a writer
+# work concurrently, synchronous=NORMAL is safe in WAL mode and avoids an
+# fsync per commit, a negative cache_size is given in KiB.
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-8192",
+    f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+)
+
+# Bounded retries of a write that failed because the database is locked
+MAX_ATTEMPTS = 5
+INITIAL_BACKOFF_SECONDS = 0.05
+
+
+def create_database_engine(database_url):
+    """
+    Create an SQLAlchemy engine for the given database URL.
+
+    SQLite databases are shared by many shells writing concurrently, so their
+    connections use WAL mode, tuned synchronous and cache settings and a busy
+    timeout instead of failing immediately on a locked database. Engines for
+    other databases are created unchanged.
+
+    Args:
+        database_url (str): Database URL.
+
+    Returns:
+        Engine: SQLAlchemy engine object.
+    """
+    if not database_url.startswith("sqlite"):
+        return create_engine(database_url)
+
+    engine = create_engine(
+        database_url,
+        connect_args={"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}
+    )
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in SQLITE_PRAGMAS:
+            cursor.execute(pragma)
+        cursor.close()
+
+    return engine
+
+
+def is_locked_error(error):
+    """
+    Check if an error was raised because the database is locked or busy.
+
+    Args:
+        error (OperationalError): The error to be checked.
+
+    Returns:
+        bool: True if the operation may succeed when retried, False otherwise.
+    """
+    message = str(error.orig).lower()
+    return "locked" in message or "busy" in message
+
+
+def run_with_retry(function, *args, **kwargs):
+    """
+    Run a database operation and retry it if the database is locked.
+
+    The operation is attempted up to MAX_ATTEMPTS times with an exponential
+    backoff and random jitter between the attempts, so concurrent writers
+    do not retry in lockstep. Other errors are raised immediately.
+
+    Args:
+        function (Callable): The database operation.
+        *args: Positional arguments passed to the operation.
+        **kwargs: Keyword arguments passed to the operation.
+
+    Returns:
+        The return value of the operation.
+
+    Raises:
+        OperationalError: If the database is still locked after the last attempt.
+    """
+    backoff = INITIAL_BACKOFF_SECONDS
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            return function(*args, **kwargs)
+        except OperationalError as error:
+            if attempt == MAX_ATTEMPTS or not is_locked_error(error):
+                raise
+        time.sleep(backoff * random.uniform(1, 2))
+        backoff *= 2
@@ -1,16 +1,57 @@
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import Column, Integer, String, TIMESTAMP, func
+from sqlalchemy import Column, Float, Index, Integer, String, TIMESTAMP, func
+from sqlalchemy.orm import column_property, deferred
 
 
 Base = declarative_base()
 
+# Number of characters of a command loaded for listing and searching
+PREVIEW_LENGTH = 1024
+
 
 class ShellCommand(Base):
+    """A recorded command.
+
+    `command` holds the full text, but is only loaded when accessed. Queries
+    load `preview`, the first PREVIEW_LENGTH characters computed by the
+    database, and `is_truncated` instead, so long commands like pasted heredocs
+    do not have to be transferred when listing the history.
+    """
     __tablename__ = 'bash_commands'
     id = Column(Integer, primary_key=True)
     user_name = Column(String)
     host = Column(String)
     path = Column(String)
     venv = Column(String, nullable=True)
+    command = deferred(Column(String))
+    time = Column(TIMESTAMP, server_default=func.current_timestamp(), index=True)
+    preview = column_property(func.substr(command.columns[0], 1, PREVIEW_LENGTH))
+    is_truncated = column_property(func.length(command.columns[0]) > PREVIEW_LENGTH)
+
+
+class CommandFrecency(Base):
+    """Frecency of a command text per user, maintained by frecency.py.
+
+    `score` is the base 2 logarithm of the exponentially decayed number of uses,
+    relative to a fixed epoch, so ordering by it does not depend on the current time.
+    `last_id` is the ID of the most recent use in bash_commands.
+    """
+    __tablename__ = 'command_frecency'
+    user_name = Column(String, primary_key=True)
+    command_hash = Column(String(40), primary_key=True)
     command = Column(String)
-    time = Column(TIMESTAMP, server_default=func.current_timestamp())
+    count = Column(Integer)
+    score = Column(Float)
+    last_id = Column(Integer)
+
+    __table_args__ = (
+        Index('ix_command_frecency_user_name_score', 'user_name', 'score'),
+    )
+
+
+class HistoryMetadata(Base):
+    """Key-value state of the database, e.g. which migrations have completed.
+    """
+    __tablename__ = 'shared_shell_history_metadata'
+    key = Column(String, primary_key=True)
+    value = Column(String)
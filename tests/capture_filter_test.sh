@@ -0,0 +1,77 @@
+#!/bin/bash
+
+# Checks the capture filters of shared_shell_history.sh.
+#
+# Only the filter functions are loaded from the script, so no config.sh or database
+# is needed. Exits with status 1 if a check fails.
+#
+# Usage:
+#   bash tests/capture_filter_test.sh
+
+SCRIPT="$(dirname "${BASH_SOURCE[0]}")/../shared_shell_history/shared_shell_history.sh"
+
+SHARED_SHELL_HISTORY_IGNORE="ls:cd *"
+SHARED_SHELL_HISTORY_EXCLUDE_REGEX="^secret-tool "
+SHARED_SHELL_HISTORY_REDACT_REGEX="[Pp][Aa][Ss][Ss][Ww][Oo][Rr][Dd]=([^[:space:]]+)"
+
+declare -A __shared_shell_history_capture_counts
+for function_name in shared_shell_history_update_capture_filters __shared_shell_history_filter_command; do
+    eval "$(sed -n "/^${function_name}() {/,/^}/p" "$SCRIPT")"
+done
+shared_shell_history_update_capture_filters
+
+failures=0
+
+# check_filter
+#
+# Filters a command like __submit_last_command_to_database, in a variable named
+# 'command', and compares the outcome with the expected one.
+#
+# Arguments:
+#   1. input: The command to be filtered.
+#   2. expected: The expected command after filtering, or DROPPED.
+#
+check_filter() {
+    local command="$1"
+    local result
+    if __shared_shell_history_filter_command command; then
+        result="$command"
+    else
+        result="DROPPED"
+    fi
+
+    if [[ "$result" != "$2" ]]; then
+        echo "FAIL: '$1' gave '$result', expected '$2'"
+        (( ++failures ))
+    fi
+}
+
+check_filter "echo first" "echo first"
+check_filter "echo first" "DROPPED"
+check_filter " echo hidden" "DROPPED"
+check_filter "ls" "DROPPED"
+check_filter "cd /tmp" "DROPPED"
+check_filter "secret-tool lookup x" "DROPPED"
+check_filter "mysql --password=hunter2 db" "mysql --password=<redacted> db"
+check_filter "a PASSWORD=x b password=y" "a PASSWORD=<redacted> b password=<redacted>"
+check_filter "mysql --password=word" "mysql --password=<redacted>"
+check_filter "export password=s" "export password=<redacted>"
+check_filter "password=password=1" "password=<redacted>"
+check_filter "echo last" "echo last"
+
+# An anchored expression only redacts the start of the command
+SHARED_SHELL_HISTORY_REDACT_REGEX="^token ([^ ;]+);"
+shared_shell_history_update_capture_filters
+check_filter "token abc;token def;" "<redacted>token def;"
+check_filter "echo token abc" "echo token abc"
+
+# A group not ending the expression is redacted with the whole match
+SHARED_SHELL_HISTORY_REDACT_REGEX="key=([^ ]+) "
+shared_shell_history_update_capture_filters
+check_filter "set key=k x" "set <redacted>x"
+
+if (( failures > 0 )); then
+    echo "$failures check(s) failed"
+    exit 1
+fi
+echo "All capture filter checks passed"
@@ -0,0 +1,107 @@
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+
+# Directory of the scripts under test
+SOURCE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "shared_shell_history"
+)
+sys.path.insert(0, SOURCE_DIR)
+
+from create_table_if_not_exists import create_schema  # noqa: E402
+from select_from_history.command_history import CommandHistory  # noqa: E402
+from select_from_history.command_list_item import CommandListItem  # noqa: E402
+from shared_shell_history_database import create_database_engine  # noqa: E402
+
+# More commands than the first page of the picker, so the full history is
+# loaded in the background
+NUMBER_OF_COMMANDS = 500
+
+
+def create_database(database_path):
+    """Creates a database with NUMBER_OF_COMMANDS commands.
+
+    Args:
+        database_path (str): The path of the SQLite database file.
+    """
+    create_schema(create_database_engine(f"sqlite:///{database_path}"))
+    with sqlite3.connect(database_path) as connection:
+        connection.executemany(
+            "INSERT INTO bash_commands (user_name, host, path, command) VALUES (?, ?, ?, ?)",
+            [
+                ("user", "host", "/tmp", f"echo {index}")
+                for index in range(NUMBER_OF_COMMANDS)
+            ]
+        )
+
+
+async def check_picker(database_path, tmp_file):
+    """Runs the picker headless and checks the rows of the command list.
+
+    Args:
+        database_path (str): The path of the SQLite database file.
+        tmp_file (str): The file the selected command would be written to.
+
+    Returns:
+        list: The descriptions of the failed checks.
+    """
+    failures = []
+    app = CommandHistory(database=f"sqlite:///{database_path}", tmp_file=tmp_file)
+    async with app.run_test() as pilot:
+        def check_rows(situation):
+            command_list_view = app.get_main_screen_widget("command_list_view")
+            rows = len(command_list_view.query(CommandListItem))
+            if rows == 0 or command_list_view.index is None:
+                failures.append(
+                    f"{situation}: {rows} rows mounted, index {command_list_view.index}, "
+                    f"{len(app.filtered_commands)} commands"
+                )
+
+        await pilot.pause()
+        check_rows("First page")
+
+        while app.loading_progress is not None:
+            await pilot.pause(0.1)
+        await pilot.pause()
+        check_rows("After loading the full history")
+
+        app.change_search_string("echo 1")
+        await pilot.pause()
+        await pilot.press("down")
+        check_rows("After a search")
+
+        # Switch to the frecency order and back to rebuild the list
+        await pilot.press("f")
+        await pilot.pause()
+        await pilot.press("f")
+        await pilot.pause()
+        check_rows("After changing the order")
+    return failures
+
+
+def main():
+    """Checks that the picker shows commands after the list is rebuilt.
+
+    Runs the picker headless on a temporary SQLite database and checks that
+    rows are mounted on the first page, after the full history is loaded,
+    after a search and after changing the order twice. Exits with status 1 otherwise.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = os.path.join(directory, "picker.db")
+        create_database(database_path)
+        failures = asyncio.run(
+            check_picker(database_path, os.path.join(directory, "command"))
+        )
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("All picker list checks passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import argparse
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+
+# Directory of the scripts under test
+SOURCE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "shared_shell_history"
+)
+
+
+def copy_scripts(target_dir):
+    """Copies the Python scripts to a temporary directory.
+
+    insert_command.py writes its dropped commands log next to itself, so the
+    copy keeps the log of the test separate from the one of the installation.
+
+    Args:
+        target_dir (str): The directory the scripts are copied to.
+    """
+    for name in os.listdir(SOURCE_DIR):
+        if name.endswith(".py"):
+            shutil.copy(os.path.join(SOURCE_DIR, name), target_dir)
+
+
+def run_writers(script_dir, database, writers):
+    """Starts concurrent insert_command.py processes and waits for all of them.
+
+    Args:
+        script_dir (str): The directory of the scripts.
+        database (str): The database URL.
+        writers (int): The number of concurrent processes.
+
+    Returns:
+        list: The exit codes of the processes.
+    """
+    processes = [
+        subprocess.Popen(
+            [
+                sys.executable, os.path.join(script_dir, "insert_command.py"),
+                "--command", f"echo stress {index}",
+                "--database", database,
+                "--host", "stress-host",
+                "--path", script_dir,
+                "--user", "stress-user",
+            ],
+            stderr=subprocess.PIPE,
+            text=True
+        )
+        for index in range(writers)
+    ]
+
+    exit_codes = []
+    for process in processes:
+        _, stderr = process.communicate()
+        if stderr:
+            print(stderr, end="", file=sys.stderr)
+        exit_codes.append(process.returncode)
+    return exit_codes
+
+
+def main():
+    """Stress test of concurrent inserts into an SQLite database.
+
+    Starts many insert_command.py processes at once against a temporary SQLite
+    file, like shells submitting commands at the same time, and checks that
+    every command was stored and none was dropped. Exits with status 1 otherwise.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writers", type=int, default=50)
+    arguments = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as script_dir:
+        copy_scripts(script_dir)
+        database_path = os.path.join(script_dir, "stress.db")
+        database = f"sqlite:///{database_path}"
+
+        subprocess.run(
+            [sys.executable, os.path.join(script_dir, "create_table_if_not_exists.py"),
+             "--database", database],
+            check=True
+        )
+
+        exit_codes = run_writers(script_dir, database, arguments.writers)
+
+        with sqlite3.connect(database_path) as connection:
+            rows = connection.execute("SELECT COUNT(*) FROM bash_commands").fetchone()[0]
+
+        dropped_log = os.path.join(script_dir, "dropped_commands.log")
+        dropped = 0
+        if os.path.exists(dropped_log):
+            with open(dropped_log) as log:
+                dropped = len(log.readlines())
+
+    failed = sum(1 for exit_code in exit_codes if exit_code != 0)
+    print(f"Writers: {arguments.writers}, rows: {rows}, failed: {failed}, dropped: {dropped}")
+
+    if rows != arguments.writers or failed or dropped:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
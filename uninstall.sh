@@ -3,6 +3,9 @@
 # Define the target directory
 TARGET_DIR="$HOME/.shared_shell_history"
 
+# Stop the picker server if it is running
+pkill -u "$USER" -f "select_from_history.picker_server" && echo "Stopped picker server"
+
 # Check if the target directory exists and remove it
 if [ -d "$TARGET_DIR" ]; then
     rm -rf "$TARGET_DIR"